@@ -1,10 +1,138 @@
 from __future__ import annotations
 
+import hashlib
 import io
-from typing import Optional
+import os
+import shutil
+import tempfile
+from typing import List, Optional
+from urllib.parse import urlparse
 
-from azure.identity import DefaultAzureCredential
-from azure.storage.blob import BlobServiceClient
+from azure.core.exceptions import ResourceNotFoundError
+from azure.storage.blob import BlobBlock, BlobServiceClient
+
+from src.metrics import get_metrics
+from src.secrets import get_credential
+
+
+# Default size of a staged block. Peak memory of a streaming upload is roughly this value
+# plus one serialized page, independent of how many records the endpoint returns.
+DEFAULT_BLOCK_BUFFER_BYTES = 8 * 1024 * 1024
+
+
+def abfss_url(account_url: str, container: str) -> str:
+    """`https://{account}.blob.core.windows.net` -> `abfss://{container}@{account}.dfs.core.windows.net` (Spark paths)."""
+    account = urlparse(account_url).netloc.split(".", 1)[0]
+    return f"abfss://{container}@{account}.dfs.core.windows.net"
+
+
+class BlockBlobWriter:
+    """
+    File-like writer that streams bytes into a block blob.
+
+    Bytes are buffered until `buffer_size` is reached and then staged as a block
+    (`buffer_size=None`: only on explicit `flush()`, so the caller picks block boundaries).
+    `close()` stages the remainder and commits the block list, so readers never see
+    a partially written blob. If the writer is abandoned (e.g. an exception inside a
+    `with` block), nothing is committed and the staged blocks stay uncommitted on the
+    service (about a week) before being garbage-collected.
+
+    `block_ids` continues an upload whose blocks were staged by an earlier writer: they
+    are committed first, followed by the blocks staged here. Each staged block is hashed
+    (`block_hashes`, passed back in together with `block_ids` on resume), which gives a
+    content hash of the whole object without a second read.
+    """
+
+    def __init__(
+        self,
+        blob_client,
+        buffer_size: Optional[int] = DEFAULT_BLOCK_BUFFER_BYTES,
+        block_ids: Optional[List[str]] = None,
+        block_hashes: Optional[List[str]] = None,
+    ):
+        if buffer_size is not None and buffer_size <= 0:
+            raise ValueError("buffer_size must be positive")
+        if len(block_hashes or []) != len(block_ids or []):
+            raise ValueError("block_hashes must match block_ids")
+        self._blob = blob_client
+        self.buffer_size = buffer_size
+        self._buf = bytearray()
+        self._block_ids: List[str] = list(block_ids or [])
+        self._block_hashes: List[str] = list(block_hashes or [])
+        self.bytes_written = 0
+        self.closed = False
+
+    def write(self, data: bytes) -> int:
+        if self.closed:
+            raise ValueError("write to closed BlockBlobWriter")
+        self._buf += data
+        self.bytes_written += len(data)
+        if self.buffer_size is not None and len(self._buf) >= self.buffer_size:
+            self.flush()
+        return len(data)
+
+    def tell(self) -> int:
+        return self.bytes_written
+
+    @property
+    def pending_bytes(self) -> int:
+        """Bytes buffered but not yet staged."""
+        return len(self._buf)
+
+    @property
+    def block_ids(self) -> List[str]:
+        """Ids of the blocks staged so far, in commit order."""
+        return list(self._block_ids)
+
+    @property
+    def block_hashes(self) -> List[str]:
+        """BLAKE2b digest of each staged block, aligned with `block_ids`."""
+        return list(self._block_hashes)
+
+    def content_hash(self) -> str:
+        """
+        Stage any buffered bytes, then hash the chain of block digests. Equal bytes cut into
+        equal blocks give equal hashes, whether or not the upload was resumed.
+        """
+        self.flush()
+        h = hashlib.blake2b(digest_size=32)
+        for d in self._block_hashes:
+            h.update(bytes.fromhex(d))
+        return h.hexdigest()
+
+    def writable(self) -> bool:
+        return True
+
+    def flush(self) -> None:
+        if not self._buf:
+            return
+        # Block ids must all have the same length within a blob; the SDK base64-encodes them.
+        block_id = f"{len(self._block_ids):08d}"
+        data = bytes(self._buf)
+        self._blob.stage_block(block_id=block_id, data=data)
+        get_metrics().inc("adls_bytes_uploaded", len(data))
+        self._block_ids.append(block_id)
+        self._block_hashes.append(hashlib.blake2b(data, digest_size=32).hexdigest())
+        self._buf.clear()
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.flush()
+        self._blob.commit_block_list([BlobBlock(block_id=b) for b in self._block_ids])
+        self.closed = True
+
+    def discard(self) -> None:
+        """Close without committing; an existing blob is left as it was."""
+        self._buf.clear()
+        self.closed = True
+
+    def __enter__(self) -> "BlockBlobWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
 
 
 class ADLSClient:
@@ -18,21 +146,192 @@ class ADLSClient:
     """
 
     def __init__(self, account_url: str):
-        credential = DefaultAzureCredential(exclude_interactive_browser_credential=False)
-        self.client = BlobServiceClient(account_url=account_url, credential=credential)
+        self.client = BlobServiceClient(account_url=account_url, credential=get_credential())
 
     def upload_text(self, container: str, blob_path: str, text: str, overwrite: bool = True) -> None:
-        blob = self.client.get_blob_client(container=container, blob=blob_path)
-        blob.upload_blob(text.encode("utf-8"), overwrite=overwrite)
+        self.upload_bytes(container, blob_path, text.encode("utf-8"), overwrite=overwrite)
 
     def download_text(self, container: str, blob_path: str) -> str:
         blob = self.client.get_blob_client(container=container, blob=blob_path)
-        return blob.download_blob().readall().decode("utf-8")
+        data = blob.download_blob().readall()
+        get_metrics().inc("adls_bytes_downloaded", len(data))
+        return data.decode("utf-8")
+
+    def download_to_file(self, container: str, blob_path: str, fileobj, max_concurrency: int = 1) -> int:
+        """
+        Stream a blob into an open binary file without holding it in memory. Returns bytes written.
+        """
+        blob = self.client.get_blob_client(container=container, blob=blob_path)
+        n = blob.download_blob(max_concurrency=max_concurrency).readinto(fileobj)
+        get_metrics().inc("adls_bytes_downloaded", n)
+        return n
 
     def upload_bytes(self, container: str, blob_path: str, data: bytes, overwrite: bool = True) -> None:
         blob = self.client.get_blob_client(container=container, blob=blob_path)
         blob.upload_blob(data, overwrite=overwrite)
+        get_metrics().inc("adls_bytes_uploaded", len(data))
+
+    def open_block_writer(
+        self,
+        container: str,
+        blob_path: str,
+        buffer_size: Optional[int] = DEFAULT_BLOCK_BUFFER_BYTES,
+        block_ids: Optional[List[str]] = None,
+        block_hashes: Optional[List[str]] = None,
+    ) -> BlockBlobWriter:
+        """
+        Open a streaming writer for `blob_path`. Committing replaces any existing blob.
+        Pass `block_ids` (still uncommitted, see `uncommitted_blocks`) and their `block_hashes`
+        to resume an upload.
+        """
+        blob = self.client.get_blob_client(container=container, blob=blob_path)
+        return BlockBlobWriter(blob, buffer_size=buffer_size, block_ids=block_ids, block_hashes=block_hashes)
+
+    def exists(self, container: str, blob_path: str) -> bool:
+        return self.client.get_blob_client(container=container, blob=blob_path).exists()
+
+    def blob_size(self, container: str, blob_path: str) -> int:
+        return self.client.get_blob_client(container=container, blob=blob_path).get_blob_properties().size
+
+    def delete_blob(self, container: str, blob_path: str) -> None:
+        try:
+            self.client.get_blob_client(container=container, blob=blob_path).delete_blob()
+        except ResourceNotFoundError:
+            pass
+
+    def uncommitted_blocks(self, container: str, blob_path: str) -> List[str]:
+        """Ids of blocks staged on `blob_path` but not committed yet ([] if the blob does not exist)."""
+        blob = self.client.get_blob_client(container=container, blob=blob_path)
+        try:
+            _, uncommitted = blob.get_block_list(block_list_type="uncommitted")
+        except ResourceNotFoundError:
+            return []
+        return [b.id for b in uncommitted]
 
     def list_blobs(self, container: str, prefix: str):
         cont = self.client.get_container_client(container)
         return [b.name for b in cont.list_blobs(name_starts_with=prefix)]
+
+
+class _LocalBlob:
+    """
+    Block-blob semantics on a local file: blocks are staged as files next to the target
+    and concatenated into it on commit, then swapped in with an atomic rename.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._staging = f"{path}.blocks"
+
+    def stage_block(self, block_id: str, data: bytes) -> None:
+        os.makedirs(self._staging, exist_ok=True)
+        with open(os.path.join(self._staging, block_id), "wb") as f:
+            f.write(data)
+
+    def uncommitted(self) -> List[str]:
+        try:
+            return sorted(os.listdir(self._staging))
+        except FileNotFoundError:
+            return []
+
+    def commit_block_list(self, blocks: List[BlobBlock]) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.path), prefix=".commit-")
+        with os.fdopen(fd, "wb") as out:
+            for b in blocks:
+                with open(os.path.join(self._staging, b.id), "rb") as f:
+                    shutil.copyfileobj(f, out)
+        os.replace(tmp, self.path)
+        shutil.rmtree(self._staging, ignore_errors=True)
+
+
+class LocalADLSClient:
+    """
+    Filesystem stand-in for `ADLSClient`: container `c`, blob `a/b` -> `{root}/c/a/b`.
+
+    Same methods and error types (missing blobs raise `ResourceNotFoundError`), so pipelines,
+    state stores and benchmarks run without a storage account.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, container: str, blob_path: str) -> str:
+        return os.path.join(self.root, container, *blob_path.split("/"))
+
+    def _open_existing(self, container: str, blob_path: str):
+        try:
+            return open(self._path(container, blob_path), "rb")
+        except FileNotFoundError:
+            raise ResourceNotFoundError(f"Blob not found: {container}/{blob_path}") from None
+
+    def upload_text(self, container: str, blob_path: str, text: str, overwrite: bool = True) -> None:
+        self.upload_bytes(container, blob_path, text.encode("utf-8"), overwrite=overwrite)
+
+    def download_text(self, container: str, blob_path: str) -> str:
+        with self._open_existing(container, blob_path) as f:
+            data = f.read()
+        get_metrics().inc("adls_bytes_downloaded", len(data))
+        return data.decode("utf-8")
+
+    def download_to_file(self, container: str, blob_path: str, fileobj, max_concurrency: int = 1) -> int:
+        with self._open_existing(container, blob_path) as f:
+            shutil.copyfileobj(f, fileobj)
+            n = f.tell()
+        get_metrics().inc("adls_bytes_downloaded", n)
+        return n
+
+    def upload_bytes(self, container: str, blob_path: str, data: bytes, overwrite: bool = True) -> None:
+        path = self._path(container, blob_path)
+        if not overwrite and os.path.exists(path):
+            raise FileExistsError(f"Blob already exists: {container}/{blob_path}")
+        blob = _LocalBlob(path)
+        blob.stage_block("00000000", data)
+        blob.commit_block_list([BlobBlock(block_id="00000000")])
+        get_metrics().inc("adls_bytes_uploaded", len(data))
+
+    def open_block_writer(
+        self,
+        container: str,
+        blob_path: str,
+        buffer_size: Optional[int] = DEFAULT_BLOCK_BUFFER_BYTES,
+        block_ids: Optional[List[str]] = None,
+        block_hashes: Optional[List[str]] = None,
+    ) -> BlockBlobWriter:
+        return BlockBlobWriter(
+            _LocalBlob(self._path(container, blob_path)),
+            buffer_size=buffer_size,
+            block_ids=block_ids,
+            block_hashes=block_hashes,
+        )
+
+    def exists(self, container: str, blob_path: str) -> bool:
+        return os.path.isfile(self._path(container, blob_path))
+
+    def blob_size(self, container: str, blob_path: str) -> int:
+        try:
+            return os.path.getsize(self._path(container, blob_path))
+        except FileNotFoundError:
+            raise ResourceNotFoundError(f"Blob not found: {container}/{blob_path}") from None
+
+    def delete_blob(self, container: str, blob_path: str) -> None:
+        try:
+            os.remove(self._path(container, blob_path))
+        except FileNotFoundError:
+            pass
+
+    def uncommitted_blocks(self, container: str, blob_path: str) -> List[str]:
+        return _LocalBlob(self._path(container, blob_path)).uncommitted()
+
+    def list_blobs(self, container: str, prefix: str):
+        base = os.path.join(self.root, container)
+        names = []
+        for dirpath, dirnames, filenames in os.walk(base):
+            dirnames[:] = [d for d in dirnames if not d.endswith(".blocks")]
+            for fn in filenames:
+                if fn.startswith(".commit-"):
+                    continue
+                name = os.path.relpath(os.path.join(dirpath, fn), base).replace(os.sep, "/")
+                if name.startswith(prefix):
+                    names.append(name)
+        return sorted(names)
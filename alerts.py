@@ -20,3 +20,15 @@ def format_qc_results(results: List[QCResult]) -> str:
         icon = "✅" if r.passed else "❌"
         lines.append(f"{icon} {r.check_name}: {r.detail}")
     return "\n".join(lines)
+
+
+def notify_qc_results(title: str, results: List[QCResult], webhook_url: str | None = None) -> str:
+    """
+    Format QC results under a title and post them to Slack when any check failed and a webhook
+    is configured (argument or SLACK_WEBHOOK_URL). Returns the formatted text for logging.
+    """
+    text = f"{title}\n{format_qc_results(results)}"
+    webhook_url = webhook_url or os.getenv("SLACK_WEBHOOK_URL")
+    if webhook_url and any(not r.passed for r in results):
+        post_slack(webhook_url, text)
+    return text
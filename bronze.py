@@ -0,0 +1,187 @@
+"""
+Bronze landing formats.
+
+  jsonl      data.jsonl          plain JSON lines (default)
+  jsonl.gz   data.jsonl.gz       gzip JSON lines, read natively by spark.read.json (one task per file)
+  jsonl.zst  data.jsonl.zst      zstd JSON lines (needs `zstandard`; Spark needs the Hadoop native zstd codec)
+  parquet    data.parquet        Arrow schema inferred from the first batch, then pinned
+
+Set `bronze_format` on a source in endpoints.yml for a default, or on an endpoint to override.
+
+The JSONL formats are resumable: `write_bronze_pages` cuts upload blocks only at page
+boundaries and starts a new gzip member / zstd frame per block, so an extraction can continue
+from its last staged block and still produce the same object as an uninterrupted run
+(concatenated members/frames are one valid stream for gzip, zstd, Spark and pandas).
+"""
+from __future__ import annotations
+
+import os
+import zlib
+from typing import BinaryIO, Callable, Iterable, List, Optional, Tuple
+
+import yaml
+
+from src.connectors.rest_api import write_jsonl
+
+
+BRONZE_FILES = {
+    "jsonl": "data.jsonl",
+    "jsonl.gz": "data.jsonl.gz",
+    "jsonl.zst": "data.jsonl.zst",
+    "parquet": "data.parquet",
+}
+
+RESUMABLE_FORMATS = ("jsonl", "jsonl.gz", "jsonl.zst")
+
+DEFAULT_FORMAT = "jsonl"
+DEFAULT_PARQUET_BATCH_ROWS = 10_000
+
+
+def load_endpoints_spec(path: Optional[str] = None) -> dict:
+    path = path or os.path.join(os.path.dirname(__file__), "..", "configs", "endpoints.yml")
+    with open(path, "r", encoding="utf-8") as f:
+        return yaml.safe_load(f)
+
+
+def bronze_format(spec: dict, source: str, endpoint: str) -> str:
+    src = spec.get(source, {})
+    fmt = src.get("bronze_format", DEFAULT_FORMAT)
+    for ep in src.get("endpoints", []):
+        if ep["name"] == endpoint:
+            fmt = ep.get("bronze_format", fmt)
+    if fmt not in BRONZE_FILES:
+        raise ValueError(f"Unknown bronze_format '{fmt}' for {source}/{endpoint}; expected one of {sorted(BRONZE_FILES)}")
+    return fmt
+
+
+def bronze_blob_path(source: str, endpoint: str, run_date: str, fmt: str = DEFAULT_FORMAT) -> str:
+    return f"bronze/{source}/{endpoint}/run_date={run_date}/{BRONZE_FILES[fmt]}"
+
+
+class _CompressingWriter:
+    """
+    Streams compressed bytes into `raw`; `finish()` flushes the compressor trailer.
+    `end_member()` finishes the current gzip member / zstd frame and starts a new one.
+    """
+
+    def __init__(self, raw: BinaryIO, fmt: str):
+        self.raw = raw
+        self.fmt = fmt
+        self._c = _compressor(fmt)
+
+    def write(self, data: bytes) -> int:
+        out = self._c.compress(data)
+        if out:
+            self.raw.write(out)
+        return len(data)
+
+    def finish(self) -> None:
+        self.raw.write(self._c.flush())
+
+    def end_member(self) -> None:
+        self.finish()
+        self._c = _compressor(self.fmt)
+
+
+def _compressor(fmt: str):
+    if fmt == "jsonl.gz":
+        # wbits=31 -> gzip container
+        return zlib.compressobj(6, zlib.DEFLATED, 31)
+    if fmt == "jsonl.zst":
+        try:
+            import zstandard
+        except ImportError as e:
+            raise RuntimeError("bronze_format 'jsonl.zst' requires the 'zstandard' package") from e
+        return zstandard.ZstdCompressor(level=3).compressobj()
+    raise ValueError(fmt)
+
+
+def _write_parquet(records: Iterable[dict], raw: BinaryIO, batch_rows: int) -> int:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = None
+    writer = None
+    count = 0
+    batch: list[dict] = []
+
+    def flush() -> None:
+        nonlocal schema, writer
+        if schema is None:
+            inferred = pa.Table.from_pylist(batch).schema
+            # Columns that were all-null in the first batch have no type yet; keep them as strings.
+            schema = pa.schema([
+                pa.field(f.name, pa.string()) if pa.types.is_null(f.type) else f for f in inferred
+            ])
+            writer = pq.ParquetWriter(pa.PythonFile(raw, mode="w"), schema, compression="zstd")
+        unknown = {k for r in batch for k in r} - set(schema.names)
+        if unknown:
+            raise ValueError(f"Fields {sorted(unknown)} not in pinned bronze schema; use a JSONL bronze_format")
+        writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+        batch.clear()
+
+    for r in records:
+        batch.append(r)
+        count += 1
+        if len(batch) >= batch_rows:
+            flush()
+    if batch:
+        flush()
+    if writer is None:
+        # Empty endpoint: still land a valid (schema-less) parquet file.
+        writer = pq.ParquetWriter(pa.PythonFile(raw, mode="w"), pa.schema([]))
+    writer.close()
+    return count
+
+
+def write_bronze(
+    records: Iterable[dict], raw: BinaryIO, fmt: str = DEFAULT_FORMAT, parquet_batch_rows: int = DEFAULT_PARQUET_BATCH_ROWS
+) -> int:
+    """
+    Serialize `records` into `raw` (e.g. a BlockBlobWriter) in the given bronze format.
+    Memory stays bounded: JSONL variants stream record by record, parquet by row batch.
+    Returns the number of records written.
+    """
+    if fmt == "jsonl":
+        return write_jsonl(records, raw)
+    if fmt in ("jsonl.gz", "jsonl.zst"):
+        sink = _CompressingWriter(raw, fmt)
+        count = write_jsonl(records, sink)
+        sink.finish()
+        return count
+    if fmt == "parquet":
+        return _write_parquet(records, raw, parquet_batch_rows)
+    raise ValueError(f"Unknown bronze format: {fmt}")
+
+
+def write_bronze_pages(
+    pages: Iterable[Tuple[int, List[dict]]],
+    writer,
+    fmt: str,
+    block_bytes: int,
+    on_block: Optional[Callable[[int, int], None]] = None,
+) -> int:
+    """
+    Serialize `(page_number, items)` pages into a `BlockBlobWriter` opened with `buffer_size=None`.
+
+    After a page, once at least `block_bytes` are buffered, the compressed member is closed and
+    the buffer is staged as one block; `on_block(next_page, records_so_far)` is then called, e.g.
+    to checkpoint the staged block ids. Block boundaries depend only on the data, so a run resumed
+    at `next_page` stages the same blocks as an uninterrupted one. JSONL formats only.
+    Returns the number of records written.
+    """
+    if fmt not in RESUMABLE_FORMATS:
+        raise ValueError(f"bronze format {fmt} cannot be written page by page; use write_bronze")
+    sink = writer if fmt == "jsonl" else _CompressingWriter(writer, fmt)
+    count = 0
+    for page, items in pages:
+        count += write_jsonl(items, sink)
+        if writer.pending_bytes >= block_bytes:
+            if sink is not writer:
+                sink.end_member()
+            writer.flush()
+            if on_block is not None:
+                on_block(page + 1, count)
+    if sink is not writer:
+        sink.finish()
+    return count
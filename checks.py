@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import os
 from dataclasses import dataclass
 from typing import Callable, Dict, List, Optional
 
@@ -33,3 +34,235 @@ def run_checks(df: pd.DataFrame, checks: List[Callable[[pd.DataFrame], QCResult]
     for fn in checks:
         results.append(fn(df))
     return results
+
+
+# ---------------------------------------------------------------------------
+# Declarative QC engine
+#
+# Checks are described as specs and evaluated together by `run_suite`: every referenced column
+# is pulled out once, its null mask is computed once and shared, and each check is a vectorized
+# expression over those arrays. Adding checks no longer means another scan per check function.
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class MinRows:
+    min_rows: int
+    name: str = "min_rows"
+
+
+@dataclass
+class NullRate:
+    column: str
+    max_null_rate: float = 0.01
+    name: str = "non_null"
+
+
+@dataclass
+class UniqueKey:
+    """
+    No two rows may share the same `columns` values. Streaming QC checks this exactly unless
+    `approx_max_duplicate_rate` opts into a HyperLogLog estimate with that error margin.
+    """
+    columns: List[str]
+    name: str = "unique"
+    approx_max_duplicate_rate: Optional[float] = None
+
+
+@dataclass
+class ValueRange:
+    column: str
+    min_value: Optional[float] = None
+    max_value: Optional[float] = None
+    max_violation_rate: float = 0.0
+    name: str = "range"
+
+
+@dataclass
+class RegexMatch:
+    column: str
+    pattern: str
+    max_violation_rate: float = 0.0
+    name: str = "regex"
+
+
+@dataclass
+class ReferentialIntegrity:
+    """
+    Every non-null `column` value must exist in `ref_column` of the reference table `ref`
+    (passed to `run_suite` in `refs`), e.g. fact_payments.customer_id -> dim_customers.id.
+    """
+    column: str
+    ref: str
+    ref_column: str
+    max_orphan_rate: float = 0.0
+    name: str = "ref_integrity"
+
+
+@dataclass
+class Freshness:
+    """
+    The newest `column` timestamp must be at most `max_age_hours` old.
+    """
+    column: str
+    max_age_hours: float
+    name: str = "freshness"
+
+
+CHECK_TYPES = {
+    "min_rows": MinRows,
+    "non_null": NullRate,
+    "unique": UniqueKey,
+    "range": ValueRange,
+    "regex": RegexMatch,
+    "ref_integrity": ReferentialIntegrity,
+    "freshness": Freshness,
+}
+
+
+def checks_from_config(items: List[Dict]) -> List:
+    """
+    Build check specs from config dicts, e.g. `{"type": "non_null", "column": "id", "max_null_rate": 0}`.
+    """
+    specs = []
+    for item in items:
+        params = dict(item)
+        kind = params.pop("type")
+        if kind not in CHECK_TYPES:
+            raise ValueError(f"Unknown QC check type '{kind}'; expected one of {sorted(CHECK_TYPES)}")
+        specs.append(CHECK_TYPES[kind](**params))
+    return specs
+
+
+def load_qc_spec(path: Optional[str] = None) -> dict:
+    """Gold-table QC rules (default: configs/qc.yml); {} when the file does not exist."""
+    import yaml
+
+    path = path or os.path.join(os.path.dirname(__file__), "..", "..", "configs", "qc.yml")
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return yaml.safe_load(f) or {}
+
+
+def spec_columns(spec) -> List[str]:
+    """Columns of the checked table that `spec` reads."""
+    if isinstance(spec, UniqueKey):
+        return list(spec.columns)
+    return [spec.column] if hasattr(spec, "column") else []
+
+
+def _to_pandas(data, columns: List[str]) -> pd.DataFrame:
+    """
+    Accept a pandas DataFrame or a pyarrow Table; for Arrow only the needed columns are converted.
+    """
+    if isinstance(data, pd.DataFrame):
+        return data
+    present = [c for c in columns if c in data.column_names]
+    return data.select(present).to_pandas()
+
+
+def _rate(n: int, total: int) -> float:
+    return n / total if total else 0.0
+
+
+def run_suite(data, specs: List, refs: Optional[Dict[str, object]] = None, now: Optional[pd.Timestamp] = None) -> List[QCResult]:
+    """
+    Evaluate all `specs` against `data` (pandas DataFrame or pyarrow Table). Per-column work
+    (conversion of the referenced columns, null masks, non-null values, numeric coercion,
+    reference key sets) is done once and shared by every check on that column; each check is
+    then one vectorized expression. Returns QCResult objects in spec order, with the same
+    naming as the single-check functions.
+    """
+    refs = refs or {}
+    needed = sorted({c for s in specs for c in spec_columns(s)})
+    df = _to_pandas(data, needed)
+    total = len(df)
+    now = now if now is not None else pd.Timestamp.now(tz="UTC")
+
+    # Shared per-column work: one null mask per referenced column
+    null_masks = {c: df[c].isna().to_numpy() for c in needed if c in df.columns}
+    null_counts = {c: int(m.sum()) for c, m in null_masks.items()}
+    # Computed on first use, then reused by later checks on the same column / reference
+    non_null: Dict[str, pd.Series] = {}
+    numeric: Dict[str, pd.Series] = {}
+    ref_keys: Dict[tuple, object] = {}
+
+    def values(c: str) -> pd.Series:
+        if c not in non_null:
+            non_null[c] = df[c][~null_masks[c]]
+        return non_null[c]
+
+    def as_numeric(c: str) -> pd.Series:
+        if c not in numeric:
+            numeric[c] = pd.to_numeric(df[c], errors="coerce")
+        return numeric[c]
+
+    results: List[QCResult] = []
+    for s in specs:
+        missing = [c for c in spec_columns(s) if c not in df.columns]
+        label = f"{s.name}:{','.join(spec_columns(s))}" if spec_columns(s) else s.name
+        if missing:
+            results.append(QCResult(label, False, f"missing_column={','.join(missing)}"))
+            continue
+
+        if isinstance(s, MinRows):
+            results.append(QCResult(s.name, total >= s.min_rows, f"rows={total} min_rows={s.min_rows}"))
+
+        elif isinstance(s, NullRate):
+            rate = _rate(null_counts[s.column], total)
+            results.append(QCResult(label, rate <= s.max_null_rate, f"null_rate={rate:.4f} max_null_rate={s.max_null_rate}"))
+
+        elif isinstance(s, UniqueKey):
+            dupes = int(df.duplicated(subset=s.columns).sum())
+            results.append(QCResult(label, dupes == 0, f"duplicate_keys={dupes}"))
+
+        elif isinstance(s, ValueRange):
+            nums = as_numeric(s.column)
+            # Non-null values that are not numbers are violations, as in streaming QC
+            bad = nums.isna() & ~null_masks[s.column]
+            if s.min_value is not None:
+                bad |= nums < s.min_value
+            if s.max_value is not None:
+                bad |= nums > s.max_value
+            rate = _rate(int(bad.sum()), total - null_counts[s.column])
+            results.append(QCResult(
+                label, rate <= s.max_violation_rate,
+                f"out_of_range_rate={rate:.4f} min={s.min_value} max={s.max_value}",
+            ))
+
+        elif isinstance(s, RegexMatch):
+            strings = values(s.column).astype(str)
+            bad = int((~strings.str.fullmatch(s.pattern)).sum())
+            rate = _rate(bad, len(strings))
+            results.append(QCResult(label, rate <= s.max_violation_rate, f"mismatch_rate={rate:.4f} pattern={s.pattern}"))
+
+        elif isinstance(s, ReferentialIntegrity):
+            if s.ref not in refs:
+                results.append(QCResult(label, False, f"missing_ref_table={s.ref}"))
+                continue
+            ref_key = (s.ref, s.ref_column)
+            if ref_key not in ref_keys:
+                ref_keys[ref_key] = _to_pandas(refs[s.ref], [s.ref_column])[s.ref_column].dropna().unique()
+            present = values(s.column)
+            orphans = int((~present.isin(ref_keys[ref_key])).sum())
+            rate = _rate(orphans, len(present))
+            results.append(QCResult(
+                label, rate <= s.max_orphan_rate,
+                f"orphans={orphans} orphan_rate={rate:.4f} ref={s.ref}.{s.ref_column}",
+            ))
+
+        elif isinstance(s, Freshness):
+            latest = pd.to_datetime(df[s.column], errors="coerce", utc=True).max()
+            if pd.isna(latest):
+                results.append(QCResult(label, False, "latest=None"))
+                continue
+            age_hours = (now - latest).total_seconds() / 3600
+            results.append(QCResult(
+                label, age_hours <= s.max_age_hours,
+                f"latest={latest.isoformat()} age_hours={age_hours:.1f} max_age_hours={s.max_age_hours}",
+            ))
+
+        else:
+            raise TypeError(f"Unsupported QC check spec: {s!r}")
+    return results
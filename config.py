@@ -15,9 +15,22 @@ class AppConfig:
     # ADLS / Blob
     adls_account_url: str
     adls_container: str
+    # Max bytes buffered in memory per streaming blob upload (one staged block; also the
+    # extract checkpoint granularity)
+    extract_buffer_bytes: int
+
+    # Bronze bytes per run (as stored) up to which the transform runs in-process instead of on Spark
+    transform_local_max_bytes: int
+
+    # Local directory for pipeline state (watermarks etc.); None -> stored in the lake under _state/
+    state_dir: str | None
 
     # Key Vault
     keyvault_url: str | None
+    # Seconds a fetched secret is reused before Key Vault is asked again
+    secret_ttl_seconds: int
+    # Optional encrypted secret cache file shared by consecutive jobs (key in SECRET_CACHE_KEY)
+    secret_cache_path: str | None
 
     # Azure SQL
     azuresql_server: str
@@ -36,7 +49,12 @@ def get_config() -> AppConfig:
         log_level=os.getenv("LOG_LEVEL", "INFO"),
         adls_account_url=os.environ["ADLS_ACCOUNT_URL"],
         adls_container=os.environ.get("ADLS_CONTAINER", "carwash-datalake"),
+        extract_buffer_bytes=int(os.environ.get("EXTRACT_BUFFER_BYTES", str(8 * 1024 * 1024))),
+        transform_local_max_bytes=int(os.environ.get("TRANSFORM_LOCAL_MAX_BYTES", str(1024 * 1024 * 1024))),
+        state_dir=os.getenv("STATE_DIR") or None,
         keyvault_url=os.getenv("AZURE_KEYVAULT_URL"),
+        secret_ttl_seconds=int(os.environ.get("SECRET_TTL_SECONDS", "3600")),
+        secret_cache_path=os.getenv("SECRET_CACHE_PATH") or None,
         azuresql_server=os.environ.get("AZURESQL_SERVER", ""),
         azuresql_database=os.environ.get("AZURESQL_DATABASE", ""),
     )
@@ -1,5 +1,10 @@
 import logging
 import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+from src.metrics import get_metrics
 
 def setup_logging(name: str = "etl") -> logging.Logger:
     level = os.getenv("LOG_LEVEL", "INFO").upper()
@@ -8,3 +13,27 @@ def setup_logging(name: str = "etl") -> logging.Logger:
         format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
     )
     return logging.getLogger(name)
+
+
+@contextmanager
+def log_stage(log: logging.Logger, stage: str) -> Iterator[Dict[str, object]]:
+    """
+    Time a pipeline stage, log one line when it ends and record it as a metrics span.
+    Put extra fields (e.g. rows) in the yielded dict:
+
+        with log_stage(log, "silver:customers") as st:
+            st["rows"] = df.count()
+    """
+    info: Dict[str, object] = {}
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield info
+    except BaseException:
+        status = "failed"
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        extra = "".join(f" {k}={v}" for k, v in info.items())
+        log.info("stage=%s status=%s seconds=%.2f%s", stage, status, seconds, extra)
+        get_metrics().record_span("stage", seconds, status, stage=stage, logger=log.name, **info)
@@ -0,0 +1,194 @@
+"""
+Pipeline metrics and tracing.
+
+A process-wide `Metrics` registry collects:
+  - counters      e.g. records_fetched{endpoint=...}, adls_bytes_uploaded
+  - timings       count/sum/max of observed durations, e.g. http_request_seconds{endpoint=...}
+  - spans         one record per timed stage (extract task, Spark stage, SQL table load)
+
+`write_metrics(stage, run_date)` exports them to $METRICS_DIR as JSON lines
+(`{stage}-{run_date}.jsonl`) and OpenMetrics text (`{stage}-{run_date}.prom`).
+`python -m src.metrics report CURRENT.jsonl [PREVIOUS.jsonl]` prints the slowest spans and the
+spans that regressed against the previous run.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _fmt_labels(labels: LabelKey) -> str:
+    if not labels:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: Dict[Tuple[str, LabelKey], float] = {}
+        self.timings: Dict[Tuple[str, LabelKey], Dict[str, float]] = {}
+        self.spans: List[dict] = []
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        k = (name, _key(labels))
+        with self._lock:
+            self.counters[k] = self.counters.get(k, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        k = (name, _key(labels))
+        with self._lock:
+            t = self.timings.setdefault(k, {"count": 0, "sum": 0.0, "max": 0.0})
+            t["count"] += 1
+            t["sum"] += seconds
+            t["max"] = max(t["max"], seconds)
+
+    def record_span(self, name: str, seconds: float, status: str = "ok", **attrs) -> None:
+        with self._lock:
+            self.spans.append({
+                "name": name,
+                "seconds": round(seconds, 6),
+                "status": status,
+                "end": time.time(),
+                "attrs": {k: v for k, v in attrs.items()},
+            })
+
+    @contextmanager
+    def span(self, name: str, **attrs) -> Iterator[dict]:
+        """
+        Time a block as a span; extra attributes can be added to the yielded dict.
+        """
+        extra: dict = {}
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            yield extra
+        except BaseException:
+            status = "failed"
+            raise
+        finally:
+            self.record_span(name, time.perf_counter() - start, status, **attrs, **extra)
+
+    def to_records(self) -> List[dict]:
+        with self._lock:
+            records = [
+                {"type": "counter", "name": n, "labels": dict(l), "value": v} for (n, l), v in self.counters.items()
+            ]
+            records += [
+                {"type": "timing", "name": n, "labels": dict(l), **t} for (n, l), t in self.timings.items()
+            ]
+            records += [{"type": "span", **s} for s in self.spans]
+        return records
+
+    def to_openmetrics(self, prefix: str = "etl") -> str:
+        lines: List[str] = []
+        with self._lock:
+            for name in sorted({n for n, _ in self.counters}):
+                lines.append(f"# TYPE {prefix}_{name} counter")
+                for (n, l), v in sorted(self.counters.items()):
+                    if n == name:
+                        lines.append(f"{prefix}_{name}_total{_fmt_labels(l)} {v}")
+            for name in sorted({n for n, _ in self.timings}):
+                lines.append(f"# TYPE {prefix}_{name} summary")
+                for (n, l), t in sorted(self.timings.items()):
+                    if n == name:
+                        lines.append(f"{prefix}_{name}_count{_fmt_labels(l)} {t['count']}")
+                        lines.append(f"{prefix}_{name}_sum{_fmt_labels(l)} {t['sum']}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+_metrics = Metrics()
+
+
+def get_metrics() -> Metrics:
+    return _metrics
+
+
+def write_metrics(stage: str, run_date: str, directory: Optional[str] = None) -> Optional[str]:
+    """
+    Export the registry to `{directory or $METRICS_DIR}/{stage}-{run_date}.jsonl|.prom`.
+    No-op (returns None) when no directory is configured.
+    """
+    directory = directory or os.getenv("METRICS_DIR")
+    if not directory:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    base = os.path.join(directory, f"{stage}-{run_date}")
+    with open(f"{base}.jsonl", "w", encoding="utf-8") as f:
+        for rec in _metrics.to_records():
+            f.write(json.dumps({"stage": stage, "run_date": run_date, **rec}, default=str) + "\n")
+    with open(f"{base}.prom", "w", encoding="utf-8") as f:
+        f.write(_metrics.to_openmetrics())
+    return f"{base}.jsonl"
+
+
+def _load_spans(paths: List[str]) -> Dict[str, float]:
+    """
+    Total seconds per span identity ("stage/name attr=value ...") over one run's JSONL files.
+    """
+    totals: Dict[str, float] = {}
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                rec = json.loads(line)
+                if rec.get("type") != "span":
+                    continue
+                ident_attrs = " ".join(
+                    f"{k}={v}" for k, v in sorted(rec["attrs"].items()) if isinstance(v, str)
+                )
+                ident = f"{rec['stage']}/{rec['name']} {ident_attrs}".strip()
+                totals[ident] = totals.get(ident, 0.0) + rec["seconds"]
+    return totals
+
+
+def run_report(
+    current: List[str], previous: Optional[List[str]] = None, top: int = 5, threshold: float = 0.2, min_seconds: float = 1.0
+) -> str:
+    """
+    Slowest spans of the current run, and spans that got slower than the previous run by more
+    than `threshold` (relative) and `min_seconds` (absolute).
+    """
+    cur = _load_spans(current)
+    lines = ["Slowest spans:"]
+    for ident, secs in sorted(cur.items(), key=lambda kv: kv[1], reverse=True)[:top]:
+        lines.append(f"  {secs:9.2f}s  {ident}")
+    if previous:
+        prev = _load_spans(previous)
+        regressions = [
+            (ident, prev[ident], secs)
+            for ident, secs in cur.items()
+            if ident in prev and secs - prev[ident] >= min_seconds and secs > prev[ident] * (1 + threshold)
+        ]
+        lines.append("Regressions vs previous run:" if regressions else "No regressions vs previous run.")
+        for ident, before, after in sorted(regressions, key=lambda r: r[2] - r[1], reverse=True):
+            change = f"+{(after / before - 1) * 100:.0f}%" if before >= 0.01 else "new cost"
+            lines.append(f"  {before:9.2f}s -> {after:9.2f}s ({change})  {ident}")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Summarize pipeline metrics")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    rep = sub.add_parser("report")
+    rep.add_argument("current", nargs="+", help="JSONL metrics files of the run to report on")
+    rep.add_argument("--previous", nargs="*", default=None, help="JSONL metrics files of the previous run")
+    rep.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args()
+    print(run_report(args.current, args.previous, threshold=args.threshold))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Local stand-in for the Superoperator REST API and the QuickBooks Online query endpoint.
+
+`MockApiServer` serves deterministic synthetic data of a configurable size on localhost,
+with optional per-request latency and periodic 429 throttling, so the extract code paths
+(`iter_paginated`, `QuickBooksClient.iter_query`, transport retries) can be exercised and
+benchmarked without credentials:
+
+  GET /customers?page=N&per_page=M        -> {"data": [...]}
+  GET /payments?page=N&per_page=M         -> {"data": [...]}
+  GET /v3/company/{realm}/query?query=... -> {"QueryResponse": {...}}  (count(*) or STARTPOSITION/MAXRESULTS)
+"""
+from __future__ import annotations
+
+import datetime as dt
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+_EPOCH = dt.datetime(2024, 1, 1, tzinfo=dt.timezone.utc)
+_STATUSES = ("succeeded", "pending", "refunded", "failed")
+_QBO_PAGE = re.compile(r"STARTPOSITION\s+(\d+)\s+MAXRESULTS\s+(\d+)", re.IGNORECASE)
+_QBO_ENTITY = re.compile(r"\bfrom\s+(\w+)", re.IGNORECASE)
+
+
+def _ts(i: int) -> str:
+    return (_EPOCH + dt.timedelta(seconds=i * 37)).isoformat()
+
+
+def customer_record(i: int) -> dict:
+    return {
+        "id": i + 1,
+        "name": f"Customer {i + 1}",
+        "email": f"customer{i + 1}@example.com",
+        "created_at": _ts(i),
+        "updated_at": _ts(i + 3600),
+    }
+
+
+def payment_record(i: int, customers: int = 10_000) -> dict:
+    return {
+        "payment_id": i + 1,
+        "customer_id": i % customers + 1,
+        "amount": round((i * 7919) % 100_000 / 100, 2),
+        "currency": "USD",
+        "status": _STATUSES[i % len(_STATUSES)],
+        "created_at": _ts(i),
+        "paid_at": _ts(i + 60) if i % 4 == 0 else None,
+        "updated_at": _ts(i + 120),
+    }
+
+
+def qbo_record(entity: str, i: int) -> dict:
+    return {
+        "Id": str(i + 1),
+        "TxnDate": _ts(i)[:10],
+        "TotalAmt": round((i * 104729) % 500_000 / 100, 2),
+        "CustomerRef": {"value": str(i % 10_000 + 1)},
+        "MetaData": {"CreateTime": _ts(i), "LastUpdatedTime": _ts(i + 120)},
+        "domain": "QBO",
+        "Entity": entity,
+    }
+
+
+REST_GENERATORS: Dict[str, Callable[[int], dict]] = {
+    "customers": customer_record,
+    "payments": payment_record,
+}
+
+
+def generate(name: str, rows: int) -> List[dict]:
+    """Materialize `rows` records of a REST endpoint (same data the server returns)."""
+    gen = REST_GENERATORS[name]
+    return [gen(i) for i in range(rows)]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "_Server"
+
+    def log_message(self, format, *args) -> None:  # keep benchmark output clean
+        pass
+
+    def _send(self, status: int, body: Optional[dict] = None, headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(body).encode("utf-8") if body is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:
+        cfg = self.server.mock
+        if cfg.latency_ms:
+            time.sleep(cfg.latency_ms / 1000)
+        if cfg.should_throttle():
+            self._send(429, {"error": "throttled"}, {"Retry-After": "0"})
+            return
+
+        url = urlparse(self.path)
+        qs = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        name = url.path.rstrip("/").rsplit("/", 1)[-1]
+
+        if url.path.startswith("/v3/company/") and name == "query":
+            self._send(200, cfg.qbo_response(qs.get("query", "")))
+        elif name in REST_GENERATORS:
+            page = int(qs.get("page", 1))
+            per_page = int(qs.get("per_page", 500))
+            start = (page - 1) * per_page
+            gen = REST_GENERATORS[name]
+            self._send(200, {"data": [gen(i) for i in range(start, min(start + per_page, cfg.rows))]})
+        else:
+            self._send(404, {"error": f"unknown path {url.path}"})
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    mock: "MockApiServer"
+
+
+class MockApiServer:
+    """
+    Threaded HTTP server on 127.0.0.1 (ephemeral port). Every endpoint has `rows` records.
+    `latency_ms` is added to each request; with `throttle_every=N` every Nth request gets
+    a 429 with `Retry-After: 0`.
+
+        with MockApiServer(rows=100_000, latency_ms=20) as api:
+            client = RestApiClient(api.base_url, headers={})
+    """
+
+    def __init__(self, rows: int, latency_ms: float = 0.0, throttle_every: int = 0):
+        self.rows = rows
+        self.latency_ms = latency_ms
+        self.throttle_every = throttle_every
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._httpd: Optional[_Server] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        if self._httpd is None:
+            raise RuntimeError("MockApiServer is not running")
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def qbo_base_url(self, realm: str = "bench") -> str:
+        return f"{self.base_url}/v3/company/{realm}"
+
+    def should_throttle(self) -> bool:
+        with self._lock:
+            self.requests += 1
+            return bool(self.throttle_every) and self.requests % self.throttle_every == 0
+
+    def qbo_response(self, query: str) -> dict:
+        m = _QBO_ENTITY.search(query)
+        entity = m.group(1) if m else "Entity"
+        if "count(*)" in query.lower():
+            return {"QueryResponse": {"totalCount": self.rows}}
+        page = _QBO_PAGE.search(query)
+        start, size = (int(page.group(1)), int(page.group(2))) if page else (1, 100)
+        first = start - 1
+        items = [qbo_record(entity, i) for i in range(first, min(first + size, self.rows))]
+        return {"QueryResponse": {entity: items, "startPosition": start, "maxResults": len(items)}}
+
+    def start(self) -> "MockApiServer":
+        self._httpd = _Server(("127.0.0.1", 0), _Handler)
+        self._httpd.mock = self
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="mock-api", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self) -> "MockApiServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.stop()
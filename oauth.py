@@ -0,0 +1,205 @@
+"""
+OAuth2 refresh-token lifecycle for QuickBooks Online.
+
+`QuickBooksTokenManager` hands out the current access token and refreshes it shortly before
+`expires_in` runs out, under a lock, so concurrent query workers share one refresh instead of
+each hitting a 401 first. Intuit rotates refresh tokens; every token response is written to a
+pluggable `TokenStore`, so the next run starts from the newest refresh token (and reuses a
+still-valid access token without a round trip).
+
+Stores:
+  - `JsonTokenStore`: wraps a `src.state.JsonStateStore` (e.g. `LocalJsonStore` for local runs)
+  - `SecretTokenStore`: one Key Vault secret holding the token document (production)
+"""
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional
+
+from azure.core.exceptions import ResourceNotFoundError
+
+from src.connectors.transport import HttpTransport, get_transport
+from src.metrics import get_metrics
+
+log = logging.getLogger(__name__)
+
+# Refresh this long before the access token expires (QBO access tokens live 1 hour).
+DEFAULT_REFRESH_MARGIN_SECONDS = 300
+DEFAULT_ACCESS_TOKEN_TTL_SECONDS = 3600
+
+
+@dataclass
+class TokenSet:
+    access_token: str
+    # Absolute expiry (epoch seconds)
+    expires_at: float
+    refresh_token: str
+    refresh_token_expires_at: Optional[float] = None
+    # Fingerprint of the configured refresh token this chain of rotations started from
+    seed: Optional[str] = None
+
+    def valid_for(self, seconds: float) -> bool:
+        return bool(self.access_token) and self.expires_at - time.time() > seconds
+
+
+def _fingerprint(refresh_token: str) -> str:
+    return hashlib.sha256(refresh_token.encode("utf-8")).hexdigest()[:16]
+
+
+class TokenStore(ABC):
+    """Persists the latest `TokenSet` document between runs."""
+
+    @abstractmethod
+    def load(self) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def save(self, doc: Dict[str, Any]) -> None:
+        ...
+
+
+class JsonTokenStore(TokenStore):
+    """
+    Token document in a JSON state store. Use with `LocalJsonStore` for local runs; the document
+    holds live credentials, so keep the file out of shared storage.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        return self.store.read() or None
+
+    def save(self, doc: Dict[str, Any]) -> None:
+        self.store.write(doc)
+
+
+class SecretTokenStore(TokenStore):
+    """Token document kept as JSON in one Key Vault secret (created on first save)."""
+
+    def __init__(self, secrets, secret_name: str):
+        self.secrets = secrets
+        self.secret_name = secret_name
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        # Another host may have rotated the tokens since this process cached the secret
+        self.secrets.invalidate(self.secret_name)
+        try:
+            return json.loads(self.secrets.get_secret(self.secret_name))
+        except (ResourceNotFoundError, ValueError):
+            return None
+
+    def save(self, doc: Dict[str, Any]) -> None:
+        self.secrets.set_secret(self.secret_name, json.dumps(doc))
+
+
+class QuickBooksTokenManager:
+    """
+    Thread-safe access-token cache with proactive refresh and refresh-token rotation.
+
+    A stored token document is only used if it descends from the configured refresh token
+    (same `seed`); after re-authorizing the app and updating the refresh-token secret, the
+    stale chain in the store is ignored.
+    """
+
+    def __init__(
+        self,
+        token_url: str,
+        client_id: str,
+        client_secret: str,
+        refresh_token: str,
+        store: Optional[TokenStore] = None,
+        transport: Optional[HttpTransport] = None,
+        timeout: int = 60,
+        refresh_margin_seconds: float = DEFAULT_REFRESH_MARGIN_SECONDS,
+        tokens: Optional[TokenSet] = None,
+    ):
+        self.token_url = token_url
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.store = store
+        self.transport = transport or get_transport()
+        self.timeout = timeout
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self._seed = _fingerprint(refresh_token)
+        self._seed_refresh_token = refresh_token
+        self._lock = threading.Lock()
+        self._tokens = tokens
+        self._loaded = tokens is not None
+
+    def _load(self) -> None:
+        self._loaded = True
+        doc = self.store.load() if self.store else None
+        if doc and doc.get("seed") == self._seed:
+            self._tokens = TokenSet(**doc)
+            log.info("Loaded QuickBooks tokens from store (access token valid for %.0fs)", self._tokens.expires_at - time.time())
+        elif doc:
+            log.warning("Ignoring stored QuickBooks tokens: refresh token was re-seeded")
+
+    @property
+    def refresh_token(self) -> str:
+        return self._tokens.refresh_token if self._tokens else self._seed_refresh_token
+
+    def access_token(self) -> str:
+        """Current access token, refreshed first if it expires within the refresh margin."""
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            if self._tokens is None or not self._tokens.valid_for(self.refresh_margin_seconds):
+                self._refresh()
+            return self._tokens.access_token
+
+    def invalidate(self, access_token: str) -> None:
+        """
+        Mark `access_token` as rejected (e.g. after a 401). Only the first caller holding that
+        token forces a refresh; later callers already see the new one.
+        """
+        with self._lock:
+            if self._tokens is not None and self._tokens.access_token == access_token:
+                self._tokens.expires_at = 0
+
+    def refresh(self) -> str:
+        """Unconditionally exchange the refresh token for a new access token."""
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            self._refresh()
+            return self._tokens.access_token
+
+    def _refresh(self) -> None:
+        basic = base64.b64encode(f"{self.client_id}:{self.client_secret}".encode()).decode()
+        headers = {
+            "Authorization": f"Basic {basic}",
+            "Content-Type": "application/x-www-form-urlencoded",
+            "Accept": "application/json",
+        }
+        data = {"grant_type": "refresh_token", "refresh_token": self.refresh_token}
+        resp = self.transport.post(self.token_url, headers=headers, data=data, timeout=self.timeout)
+        resp.raise_for_status()
+        token_json = resp.json()
+        get_metrics().inc("oauth_token_refreshes", provider="quickbooks")
+
+        now = time.time()
+        rotated = token_json.get("refresh_token") or self.refresh_token
+        refresh_ttl = token_json.get("x_refresh_token_expires_in")
+        self._tokens = TokenSet(
+            access_token=token_json["access_token"],
+            expires_at=now + float(token_json.get("expires_in", DEFAULT_ACCESS_TOKEN_TTL_SECONDS)),
+            refresh_token=rotated,
+            refresh_token_expires_at=now + float(refresh_ttl) if refresh_ttl else None,
+            seed=self._seed,
+        )
+        if rotated != data["refresh_token"]:
+            log.info("QuickBooks refresh token rotated")
+        if self.store is not None:
+            # Persist before anyone uses the new access token: the old refresh token may now be dead.
+            self.store.save(asdict(self._tokens))
+        elif rotated != data["refresh_token"]:
+            log.warning("QuickBooks refresh token rotated but no token store is configured; the next run will use the old one")
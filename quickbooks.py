@@ -1,12 +1,16 @@
 from __future__ import annotations
 
-import base64
 import json
+import math
+import re
 import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
-import requests
+from src.connectors.oauth import QuickBooksTokenManager, TokenStore
+from src.connectors.transport import HttpTransport, RateLimit, get_transport
+from src.metrics import get_metrics
 
 
 @dataclass
@@ -17,22 +21,80 @@ class QuickBooksAuthConfig:
     refresh_token: str
 
 
+@dataclass
+class QueryPagination:
+    # QBO caps MAXRESULTS at 1000
+    page_size: int = 1000
+    # Pages fetched in parallel after a `select count(*)` probe. 1 = sequential, no probe.
+    concurrency: int = 1
+
+
+_PAGING_RE = re.compile(r"\s+(startposition|maxresults)\s+\d+", re.IGNORECASE)
+_ENTITY_RE = re.compile(r"\bfrom\s+(\w+)", re.IGNORECASE)
+_SELECT_RE = re.compile(r"^\s*select\s+.+?\s+from\s+", re.IGNORECASE | re.DOTALL)
+
+
+def _base_query(query: str) -> str:
+    """
+    Strip any STARTPOSITION/MAXRESULTS from a configured query and pin an order so that
+    pages are disjoint and stable.
+    """
+    q = _PAGING_RE.sub("", query).strip()
+    if "orderby" not in q.lower():
+        q = f"{q} ORDERBY Id"
+    return q
+
+
+def _entity_name(query: str) -> str:
+    m = _ENTITY_RE.search(query)
+    if not m:
+        raise ValueError(f"Cannot find entity in QuickBooks query: {query!r}")
+    return m.group(1)
+
+
+def _count_query(query: str) -> str:
+    q = re.sub(r"\s+orderby\s+.*$", "", query, flags=re.IGNORECASE)
+    return _SELECT_RE.sub("select count(*) from ", q, count=1)
+
+
 class QuickBooksClient:
     """
     Minimal QuickBooks Online connector.
 
     Notes:
     - QuickBooks uses OAuth2. In production, store secrets in Key Vault.
-    - This connector refreshes an access token using a refresh token.
+    - Access tokens come from a `QuickBooksTokenManager` (refresh ahead of expiry, rotation
+      persisted to `token_store`), shared by all query threads of the client.
     - Data is fetched using QBO query endpoint (SQL-like queries).
     """
 
-    def __init__(self, auth: QuickBooksAuthConfig, company_id: str, env: str = "production", timeout: int = 60):
+    def __init__(
+        self,
+        auth: QuickBooksAuthConfig,
+        company_id: str,
+        env: str = "production",
+        timeout: int = 60,
+        transport: Optional[HttpTransport] = None,
+        rate_limit: Optional[RateLimit] = None,
+        token_store: Optional[TokenStore] = None,
+        tokens: Optional[QuickBooksTokenManager] = None,
+    ):
         self.auth = auth
         self.company_id = company_id
         self.env = env
         self.timeout = timeout
-        self._access_token: Optional[str] = None
+        self.transport = transport or get_transport()
+        if rate_limit:
+            self.transport.set_rate_limit(self.base_url, rate_limit)
+        self.tokens = tokens or QuickBooksTokenManager(
+            auth.token_url,
+            auth.client_id,
+            auth.client_secret,
+            auth.refresh_token,
+            store=token_store,
+            transport=self.transport,
+            timeout=timeout,
+        )
 
     @property
     def base_url(self) -> str:
@@ -41,28 +103,11 @@ class QuickBooksClient:
         return f"https://{host}/v3/company/{self.company_id}"
 
     def refresh_access_token(self) -> str:
-        basic = base64.b64encode(f"{self.auth.client_id}:{self.auth.client_secret}".encode()).decode()
-        headers = {
-            "Authorization": f"Basic {basic}",
-            "Content-Type": "application/x-www-form-urlencoded",
-            "Accept": "application/json",
-        }
-        data = {
-            "grant_type": "refresh_token",
-            "refresh_token": self.auth.refresh_token,
-        }
-        resp = requests.post(self.auth.token_url, headers=headers, data=data, timeout=self.timeout)
-        resp.raise_for_status()
-        token_json = resp.json()
-        self._access_token = token_json["access_token"]
-        # QBO might return a new refresh_token; handle if you want rotation.
-        return self._access_token
-
-    def _headers(self) -> Dict[str, str]:
-        if not self._access_token:
-            self.refresh_access_token()
+        return self.tokens.refresh()
+
+    def _headers(self, access_token: str) -> Dict[str, str]:
         return {
-            "Authorization": f"Bearer {self._access_token}",
+            "Authorization": f"Bearer {access_token}",
             "Accept": "application/json",
             "Content-Type": "application/text",
         }
@@ -70,12 +115,85 @@ class QuickBooksClient:
     def query(self, query: str, minorversion: int = 75) -> dict:
         url = f"{self.base_url}/query"
         params = {"query": query, "minorversion": minorversion}
-        resp = requests.get(url, headers=self._headers(), params=params, timeout=self.timeout)
+        start = time.perf_counter()
+        token = self.tokens.access_token()
+        resp = self.transport.get(url, headers=self._headers(token), params=params, timeout=self.timeout)
 
-        # If token expired, refresh once and retry
+        # Token revoked or expired early: refresh once (shared with concurrent workers) and retry
         if resp.status_code == 401:
-            self.refresh_access_token()
-            resp = requests.get(url, headers=self._headers(), params=params, timeout=self.timeout)
+            self.tokens.invalidate(token)
+            resp = self.transport.get(
+                url, headers=self._headers(self.tokens.access_token()), params=params, timeout=self.timeout
+            )
 
+        get_metrics().observe(
+            "http_request_seconds", time.perf_counter() - start, endpoint=f"qbo:{_entity_name(query)}", status=resp.status_code
+        )
         resp.raise_for_status()
         return resp.json()
+
+    def count(self, query: str) -> int:
+        data = self.query(_count_query(query))
+        return int(data.get("QueryResponse", {}).get("totalCount", 0))
+
+    def _query_page(self, base: str, entity: str, start: int, size: int) -> List[dict]:
+        data = self.query(f"{base} STARTPOSITION {start} MAXRESULTS {size}")
+        items = data.get("QueryResponse", {}).get(entity, [])
+        metrics = get_metrics()
+        metrics.inc("pages_fetched", endpoint=f"qbo:{entity}")
+        metrics.inc("records_fetched", len(items), endpoint=f"qbo:{entity}")
+        return items
+
+    def iter_query_pages(
+        self, query: str, pagination: Optional[QueryPagination] = None, start_page: int = 1
+    ) -> Iterable[Tuple[int, List[dict]]]:
+        """
+        Yield `(page_number, items)` for every entity matching `query`, page by page via
+        STARTPOSITION/MAXRESULTS (page n starts at row (n - 1) * page_size + 1), from `start_page` on.
+
+        With `pagination.concurrency > 1`, the total is probed with `select count(*)` and the
+        known pages are fetched in windows on a thread pool; pages are still yielded in
+        order. Rows added after the probe are picked up by continuing sequentially
+        until a short page.
+        """
+        pagination = pagination or QueryPagination()
+        size = pagination.page_size
+        base = _base_query(query)
+        entity = _entity_name(base)
+
+        page = start_page
+        if pagination.concurrency > 1:
+            planned_pages = math.ceil(self.count(base) / size)
+            window = pagination.concurrency
+            with ThreadPoolExecutor(max_workers=window, thread_name_prefix="qbo-page") as pool:
+                while page <= planned_pages:
+                    last = min(page + window - 1, planned_pages)
+                    futures = [
+                        pool.submit(self._query_page, base, entity, (p - 1) * size + 1, size)
+                        for p in range(page, last + 1)
+                    ]
+                    for i, fut in enumerate(futures):
+                        items = fut.result()
+                        if items:
+                            yield page + i, items
+                        if len(items) < size:
+                            # Fewer rows than counted (deletes since the probe): we are done.
+                            for f in futures[i + 1:]:
+                                f.cancel()
+                            return
+                    page = last + 1
+
+        while True:
+            items = self._query_page(base, entity, (page - 1) * size + 1, size)
+            if items:
+                yield page, items
+            if len(items) < size:
+                return
+            page += 1
+
+    def iter_query(self, query: str, pagination: Optional[QueryPagination] = None) -> Iterable[dict]:
+        """
+        Stream every entity matching `query` (see `iter_query_pages`).
+        """
+        for _, items in self.iter_query_pages(query, pagination):
+            yield from items
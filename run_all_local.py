@@ -16,9 +16,8 @@ def run(cmd: list[str]) -> None:
 
 def main() -> None:
     run([sys.executable, "pipelines/run_extract.py"])
-    # Transform step is a spark job in real usage, so we only show command template.
-    print("\nTransform is a PySpark job. Example:")
-    print("  spark-submit pipelines/run_transform.py --run-date $RUN_DATE --abfss-prefix abfss://<container>@<account>.dfs.core.windows.net")
+    # In-process transform for small days; above TRANSFORM_LOCAL_MAX_BYTES it spark-submits run_transform.py.
+    run([sys.executable, "pipelines/run_transform_local.py"])
     run([sys.executable, "pipelines/run_load.py"])
 
 if __name__ == "__main__":
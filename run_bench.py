@@ -0,0 +1,313 @@
+"""
+End-to-end throughput benchmarks against local stand-ins (no Azure, no API credentials):
+
+  - REST / QuickBooks extract  -> `src.mock_api.MockApiServer` on localhost
+  - ADLS                       -> `src.adls.LocalADLSClient` in a temp directory
+  - Azure SQL                  -> SQLite file (same staging + MERGE code path as production)
+
+Each benchmark runs at every `--sizes` row count and appends one JSON line per run to
+`--output` (bench, rows, seconds, rows_per_second, params, commit, ...). With `--baseline`
+the results are compared to an earlier output file by (bench, rows, params), and the process
+exits non-zero if throughput dropped by more than `--max-regression`, so it can gate a deploy:
+
+  python pipelines/run_bench.py --sizes 10k,1m --output bench_output.txt
+  python pipelines/run_bench.py --sizes 10k,1m --baseline bench_baseline.txt --max-regression 0.2
+
+The default sizes (10k, 1M, 10M) need several GB of RAM for the in-memory stages
+(`load_parquet_from_adls`, `upsert_dataframe`, `run_suite`) at 10M rows.
+"""
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from src.adls import LocalADLSClient
+from src.logging_utils import setup_logging
+from src.mock_api import MockApiServer, generate
+from src.connectors.oauth import QuickBooksTokenManager, TokenSet
+from src.connectors.quickbooks import QuickBooksAuthConfig, QuickBooksClient, QueryPagination
+from src.connectors.rest_api import PagePagination, RestApiClient, iter_paginated, to_jsonl
+
+log = setup_logging("bench")
+
+BENCHES = ("iter_paginated", "qbo_iter_query", "to_jsonl", "load_parquet_from_adls", "upsert_dataframe", "qc")
+CONTAINER = "lake"
+# Rows per generated parquet part / per to_jsonl call (one extract page is far smaller).
+PART_ROWS = 1_000_000
+JSONL_CHUNK_ROWS = 50_000
+QC_SPEC = [
+    {"type": "min_rows", "min_rows": 1},
+    {"type": "non_null", "column": "payment_id", "max_null_rate": 0},
+    {"type": "unique", "columns": ["payment_id"]},
+    {"type": "range", "column": "amount", "min_value": 0, "max_violation_rate": 0.01},
+    {"type": "ref_integrity", "column": "customer_id", "ref": "dim_customers", "ref_column": "id", "max_orphan_rate": 0.01},
+]
+CUSTOMERS = 10_000
+
+
+def parse_size(s: str) -> int:
+    """'10k' -> 10_000, '1m' -> 1_000_000, '2500' -> 2500."""
+    s = s.strip().lower().replace("_", "")
+    mult = {"k": 1_000, "m": 1_000_000}.get(s[-1:], 1)
+    return int(float(s[:-1] if mult > 1 else s) * mult)
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class _BenchQuickBooksClient(QuickBooksClient):
+    """QuickBooks client pointed at the mock server, with a fixed access token (no OAuth round-trip)."""
+
+    def __init__(self, base_url: str, **kwargs):
+        auth = QuickBooksAuthConfig(token_url=f"{base_url}/token", client_id="bench", client_secret="bench", refresh_token="bench")
+        tokens = QuickBooksTokenManager(
+            auth.token_url, auth.client_id, auth.client_secret, auth.refresh_token,
+            tokens=TokenSet(access_token="bench", expires_at=time.time() + 86_400, refresh_token="bench"),
+        )
+        self._base_url = base_url
+        super().__init__(auth, company_id="bench", tokens=tokens, **kwargs)
+
+    @property
+    def base_url(self) -> str:
+        return self._base_url
+
+
+def payments_table(start: int, rows: int):
+    """Columnar synthetic payments (same shape as `mock_api.payment_record`), built without Python dicts."""
+    import numpy as np
+    import pyarrow as pa
+
+    i = np.arange(start, start + rows, dtype=np.int64)
+    epoch = np.datetime64("2024-01-01T00:00:00", "s")
+    status = np.array(["succeeded", "pending", "refunded", "failed"], dtype=object)
+    return pa.table({
+        "payment_id": i + 1,
+        "customer_id": i % CUSTOMERS + 1,
+        "amount": (i * 7919 % 100_000) / 100,
+        "currency": pa.array(np.full(rows, "USD", dtype=object), pa.string()),
+        "status": pa.array(status[i % 4], pa.string()),
+        "created_at": pa.array(epoch + i * 37, pa.timestamp("s", tz="UTC")),
+        "updated_at": pa.array(epoch + i * 37 + 120, pa.timestamp("s", tz="UTC")),
+    })
+
+
+def _write_gold_parts(adls: LocalADLSClient, prefix: str, rows: int) -> None:
+    import pyarrow.parquet as pq
+
+    for n, start in enumerate(range(0, rows, PART_ROWS)):
+        table = payments_table(start, min(PART_ROWS, rows - start))
+        path = os.path.join(adls.root, CONTAINER, *prefix.split("/"), f"part-{n:05d}.parquet")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        pq.write_table(table, path)
+
+
+# -- benchmarks ------------------------------------------------------------------------------
+# Each returns (rows processed, seconds, extra fields); setup is excluded from the timing.
+
+
+def bench_iter_paginated(rows: int, args, workdir: str) -> Tuple[int, float, dict]:
+    pagination = PagePagination(page_size=args.page_size, concurrency=args.concurrency)
+    with MockApiServer(rows, latency_ms=args.latency_ms, throttle_every=args.throttle_every) as api:
+        client = RestApiClient(api.base_url, headers={})
+        start = time.perf_counter()
+        n = sum(1 for _ in iter_paginated(client, "/payments", pagination))
+        return n, time.perf_counter() - start, {"requests": api.requests}
+
+
+def bench_qbo_iter_query(rows: int, args, workdir: str) -> Tuple[int, float, dict]:
+    pagination = QueryPagination(page_size=min(args.page_size, 1000), concurrency=args.concurrency)
+    with MockApiServer(rows, latency_ms=args.latency_ms, throttle_every=args.throttle_every) as api:
+        qb = _BenchQuickBooksClient(api.qbo_base_url())
+        start = time.perf_counter()
+        n = sum(1 for _ in qb.iter_query("select * from Payment", pagination))
+        return n, time.perf_counter() - start, {"requests": api.requests}
+
+
+def bench_to_jsonl(rows: int, args, workdir: str) -> Tuple[int, float, dict]:
+    chunk = generate("payments", min(rows, JSONL_CHUNK_ROWS))
+    seconds, out_bytes, done = 0.0, 0, 0
+    while done < rows:
+        records = chunk[: rows - done]
+        start = time.perf_counter()
+        out_bytes += len(to_jsonl(records))
+        seconds += time.perf_counter() - start
+        done += len(records)
+    return done, seconds, {"bytes": out_bytes}
+
+
+def bench_load_parquet_from_adls(rows: int, args, workdir: str) -> Tuple[int, float, dict]:
+    from run_load import load_parquet_from_adls
+
+    adls = LocalADLSClient(os.path.join(workdir, "adls"))
+    prefix = f"gold/finance/fact_payments/run_date=bench-{rows}"
+    _write_gold_parts(adls, prefix, rows)
+    start = time.perf_counter()
+    df = load_parquet_from_adls(adls, CONTAINER, prefix)
+    return len(df), time.perf_counter() - start, {"files": -(-rows // PART_ROWS)}
+
+
+def bench_upsert_dataframe(rows: int, args, workdir: str) -> Tuple[int, float, dict]:
+    from sqlalchemy import create_engine
+
+    from run_load import upsert_dataframe
+    from src.sql_bulk import create_staging_table
+
+    table = payments_table(0, rows)
+    df = table.to_pandas()
+    engine = create_engine(f"sqlite:///{os.path.join(workdir, f'bench-{rows}.db')}")
+    create_staging_table(engine, "fact_payments", table.schema)
+
+    # First pass inserts every row; the second re-merges identical rows (row_hash skips the writes).
+    start = time.perf_counter()
+    upsert_dataframe(engine, df, "fact_payments", ["payment_id"])
+    insert_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    upsert_dataframe(engine, df, "fact_payments", ["payment_id"])
+    noop_seconds = time.perf_counter() - start
+    engine.dispose()
+    return rows, insert_seconds, {"noop_merge_seconds": round(noop_seconds, 4)}
+
+
+def bench_qc(rows: int, args, workdir: str) -> Tuple[int, float, dict]:
+    import pyarrow as pa
+
+    from src.qc.checks import ReferentialIntegrity, checks_from_config, run_suite
+    from src.qc.streaming import StreamingQC
+
+    specs = checks_from_config(QC_SPEC)
+    table = payments_table(0, rows)
+    refs = {"dim_customers": pa.table({"id": pa.array(range(1, CUSTOMERS + 1), pa.int64())})}
+
+    start = time.perf_counter()
+    results = run_suite(table, specs, refs=refs)
+    suite_seconds = time.perf_counter() - start
+
+    qc = StreamingQC([s for s in specs if not isinstance(s, ReferentialIntegrity)])
+    start = time.perf_counter()
+    for _ in qc.observe_batches(table.to_batches(max_chunksize=100_000)):
+        pass
+    qc.results()
+    streaming_seconds = time.perf_counter() - start
+    return rows, suite_seconds, {
+        "passed": all(r.passed for r in results),
+        "streaming_seconds": round(streaming_seconds, 4),
+    }
+
+
+BENCH_FUNCS: Dict[str, Callable[[int, argparse.Namespace, str], Tuple[int, float, dict]]] = {
+    "iter_paginated": bench_iter_paginated,
+    "qbo_iter_query": bench_qbo_iter_query,
+    "to_jsonl": bench_to_jsonl,
+    "load_parquet_from_adls": bench_load_parquet_from_adls,
+    "upsert_dataframe": bench_upsert_dataframe,
+    "qc": bench_qc,
+}
+
+
+def _params(bench: str, args) -> dict:
+    if bench in ("iter_paginated", "qbo_iter_query"):
+        return {
+            "page_size": args.page_size,
+            "concurrency": args.concurrency,
+            "latency_ms": args.latency_ms,
+            "throttle_every": args.throttle_every,
+        }
+    return {}
+
+
+def run_benchmarks(benches: Iterable[str], sizes: Iterable[int], args) -> List[dict]:
+    commit = _git_commit()
+    records = []
+    with tempfile.TemporaryDirectory(prefix="etl-bench-") as workdir:
+        for bench in benches:
+            for rows in sizes:
+                log.info("bench=%s rows=%s starting", bench, rows)
+                n, seconds, extra = BENCH_FUNCS[bench](rows, args, workdir)
+                rec = {
+                    "bench": bench,
+                    "rows": n,
+                    "seconds": round(seconds, 4),
+                    "rows_per_second": round(n / seconds, 1) if seconds > 0 else None,
+                    "params": _params(bench, args),
+                    **extra,
+                    "commit": commit,
+                    "python": platform.python_version(),
+                    "timestamp": dt.datetime.now(dt.timezone.utc).isoformat(timespec="seconds"),
+                }
+                log.info("bench=%s rows=%s seconds=%.2f rows_per_second=%s", bench, n, seconds, rec["rows_per_second"])
+                records.append(rec)
+    return records
+
+
+def _bench_key(rec: dict) -> Tuple[str, int, str]:
+    return rec["bench"], rec["rows"], json.dumps(rec.get("params", {}), sort_keys=True)
+
+
+def compare_to_baseline(records: List[dict], baseline_path: str, max_regression: float) -> List[str]:
+    """
+    Return one line per benchmark whose rows/s fell more than `max_regression` below the
+    baseline run with the same (bench, rows, params). The latest baseline line per key wins.
+    """
+    baseline: Dict[Tuple[str, int, str], dict] = {}
+    with open(baseline_path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                rec = json.loads(line)
+                baseline[_bench_key(rec)] = rec
+    regressions = []
+    for rec in records:
+        base = baseline.get(_bench_key(rec))
+        if not base or not base.get("rows_per_second") or not rec.get("rows_per_second"):
+            continue
+        ratio = rec["rows_per_second"] / base["rows_per_second"]
+        if ratio < 1 - max_regression:
+            regressions.append(
+                f"{rec['bench']} rows={rec['rows']}: {base['rows_per_second']:.0f} -> "
+                f"{rec['rows_per_second']:.0f} rows/s ({(ratio - 1) * 100:.0f}%)"
+            )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Pipeline throughput benchmarks on local stand-ins")
+    parser.add_argument("--bench", nargs="*", choices=BENCHES, default=list(BENCHES))
+    parser.add_argument("--sizes", default="10k,1m,10m", help="Comma-separated row counts (k/m suffixes)")
+    parser.add_argument("--output", default="bench_output.txt", help="JSON lines file results are appended to")
+    parser.add_argument("--baseline", default=None, help="Earlier output file to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed relative drop in rows/s")
+    parser.add_argument("--page-size", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=4, help="Pages in flight for the extract benches")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Mock server latency per request")
+    parser.add_argument("--throttle-every", type=int, default=0, help="Mock server returns 429 every N requests")
+    args = parser.parse_args()
+
+    sizes = [parse_size(s) for s in args.sizes.split(",") if s.strip()]
+    records = run_benchmarks(args.bench, sizes, args)
+
+    with open(args.output, "a", encoding="utf-8") as f:
+        for rec in records:
+            f.write(json.dumps(rec, sort_keys=True) + "\n")
+    log.info("Wrote %s results to %s", len(records), args.output)
+
+    if args.baseline:
+        regressions = compare_to_baseline(records, args.baseline, args.max_regression)
+        for line in regressions:
+            log.error("regression: %s", line)
+        if regressions:
+            raise SystemExit(f"{len(regressions)} benchmark(s) regressed by more than {args.max_regression:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,71 @@
 from __future__ import annotations
 
+import functools
 import os
-import yaml
+from dataclasses import dataclass
+from typing import Callable, Iterable, List, Optional, Tuple
 
 from src.config import get_config
 from src.logging_utils import setup_logging
-from src.secrets import SecretProvider
+from src.metrics import write_metrics
+from src.secrets import SecretProvider, make_secret_provider
 from src.adls import ADLSClient
+from src.bronze import (
+    RESUMABLE_FORMATS,
+    bronze_blob_path,
+    bronze_format,
+    load_endpoints_spec,
+    write_bronze,
+    write_bronze_pages,
+)
+from src.scheduler import Task, format_summary, run_tasks
+from src.state import (
+    CHANGED,
+    UNCHANGED,
+    CursorTracker,
+    KeyedState,
+    LocalJsonStore,
+    WatermarkStore,
+    extract_entry_key,
+    make_state_store,
+    parse_cursor,
+    run_finished,
+    run_manifest_name,
+)
+from src.qc.alerts import notify_qc_results
+from src.qc.checks import checks_from_config
+from src.qc.streaming import StreamingQC
 
-from src.connectors.rest_api import RestApiClient, PagePagination, IncrementalConfig, iter_paginated, to_jsonl
-from src.connectors.quickbooks import QuickBooksClient, QuickBooksAuthConfig
+from src.connectors.rest_api import RestApiClient, PagePagination, IncrementalConfig, iter_pages, page_params
+from src.connectors.oauth import JsonTokenStore, SecretTokenStore, TokenStore
+from src.connectors.quickbooks import QuickBooksClient, QuickBooksAuthConfig, QueryPagination
+from src.connectors.transport import RateLimit
 
 
 log = setup_logging("extract")
 
+# Endpoints of one source that may run at the same time, unless the source sets max_concurrency.
+DEFAULT_SOURCE_CONCURRENCY = 2
 
-def extract_superoperator(cfg, secrets: SecretProvider, adls: ADLSClient, spec: dict) -> None:
+
+def _rate_limit(spec: dict):
+    rl = spec.get("rate_limit")
+    if not rl:
+        return None
+    return RateLimit(requests_per_second=float(rl.get("requests_per_second", 5)), burst=int(rl.get("burst", 10)))
+
+
+def _secret_names(spec: dict) -> List[str]:
+    # Every `*_secret_env` auth setting names an env var that holds a Key Vault secret name
+    return [
+        os.environ[env]
+        for source in spec.values()
+        for key, env in source.get("auth", {}).items()
+        if key.endswith("_secret_env") and os.getenv(env)
+    ]
+
+
+def _superoperator_client(secrets: SecretProvider, spec: dict) -> RestApiClient:
     base_url = os.environ[spec["base_url_env"]]
 
     api_key_secret_name = os.environ[spec["auth"]["api_key_secret_env"]]
@@ -25,27 +75,250 @@ def extract_superoperator(cfg, secrets: SecretProvider, adls: ADLSClient, spec:
     header_template = spec["auth"]["header_template"]
     headers = {header_name: header_template.format(api_key=api_key)}
 
-    client = RestApiClient(base_url=base_url, headers=headers)
+    return RestApiClient(base_url=base_url, headers=headers, rate_limit=_rate_limit(spec))
+
+
+@dataclass
+class ExtractState:
+    """
+    State documents shared by the endpoint workers of one run; a part left as None is not used.
+    """
+    # Staged-block checkpoints, so a rerun resumes a failed endpoint
+    checkpoints: Optional[KeyedState] = None
+    # Content hash and blob of the last committed output per endpoint
+    content_hashes: Optional[KeyedState] = None
+    # This run_date's manifest (changed/unchanged per endpoint) read by transform and load
+    run_manifest: Optional[KeyedState] = None
+
+
+def _checkpoint_key(source: str, name: str, run_date: str) -> str:
+    return f"{source}/{name}/{run_date}"
+
+
+def _resume_point(
+    cfg, adls: ADLSClient, state: Optional[ExtractState], source: str, name: str, fmt: str, request: dict
+) -> Optional[dict]:
+    """
+    Checkpoint of an earlier, failed attempt at this endpoint and run_date, if it can be continued:
+    same bronze blob and request settings, and all its blocks still staged (uncommitted).
+    """
+    if state is None or state.checkpoints is None or fmt not in RESUMABLE_FORMATS:
+        return None
+    key = _checkpoint_key(source, name, cfg.run_date)
+    cp = state.checkpoints.get(key)
+    if not cp:
+        return None
+    blob_path = bronze_blob_path(source, name, cfg.run_date, fmt)
+    staged = set(adls.uncommitted_blocks(cfg.adls_container, blob_path))
+    if (
+        cp.get("blob") == blob_path
+        and cp.get("request") == request
+        and len(cp.get("block_hashes", [])) == len(cp["block_ids"])
+        and set(cp["block_ids"]) <= staged
+    ):
+        log.info(
+            "Resuming %s at page %s (%s records in %s staged blocks)",
+            key, cp["next_page"], cp["records"], len(cp["block_ids"]),
+        )
+        return cp
+    log.warning("Discarding checkpoint for %s: blob, request settings or staged blocks changed", key)
+    state.checkpoints.delete(key)
+    return None
+
+
+def _unchanged_since(
+    cfg, adls: ADLSClient, state: Optional[ExtractState], source: str, name: str, content_hash: str
+) -> Optional[dict]:
+    """
+    The last committed output of this endpoint if it has exactly this content, belongs to an
+    earlier run_date whose transform and load finished, and its blob still exists.
+
+    A rerun of this run_date never counts as unchanged: its own blob may not have reached gold
+    yet, and an endpoint the manifest already records as changed stays changed.
+    """
+    if state is None or state.content_hashes is None:
+        return None
+    prev = state.content_hashes.get(f"{source}/{name}")
+    if not prev or prev["hash"] != content_hash or prev["run_date"] >= cfg.run_date:
+        return None
+    if state.run_manifest is not None:
+        current = state.run_manifest.get(extract_entry_key(source, name))
+        if current and current.get("status") == CHANGED:
+            return None
+    if not run_finished(make_state_store(cfg, adls, run_manifest_name(prev["run_date"])).read()):
+        log.info("%s/%s matches run_date=%s, which has not finished transform and load", source, name, prev["run_date"])
+        return None
+    if not adls.exists(cfg.adls_container, prev["blob"]):
+        return None
+    return prev
+
+
+def _land_bronze(
+    cfg,
+    adls: ADLSClient,
+    source: str,
+    name: str,
+    fmt: str,
+    pages: Iterable[Tuple[int, List[dict]]],
+    qc_spec=None,
+    state: Optional[ExtractState] = None,
+    resume: Optional[dict] = None,
+    checkpoint_fields: Optional[Callable[[], dict]] = None,
+) -> int:
+    """
+    Stream `(page, items)` into the endpoint's bronze blob; the blob is committed only on success.
+
+    For JSONL formats every staged block is checkpointed (block ids and hashes, next page, record
+    count and `checkpoint_fields()`), and `resume` continues the upload of an earlier attempt from
+    there. If the content hash equals the last committed output of the endpoint, nothing is
+    committed and the run manifest marks the endpoint unchanged, pointing at that earlier blob.
+    """
+    # QC statistics are collected on the way to the writer, not in a separate pass.
+    qc = None
+    if qc_spec and resume is None:
+        qc = StreamingQC(checks_from_config(qc_spec))
+        pages = ((p, list(qc.observe_records(items))) for p, items in pages)
+    elif qc_spec:
+        log.warning("Extract QC skipped for %s/%s: resumed run only sees pages from %s on", source, name, resume["next_page"])
+
+    blob_path = bronze_blob_path(source, name, cfg.run_date, fmt)
+    endpoint_key = f"{source}/{name}"
+    checkpoints = state.checkpoints if state is not None else None
+    if fmt not in RESUMABLE_FORMATS:
+        records = (r for _, items in pages for r in items)
+        writer = adls.open_block_writer(cfg.adls_container, blob_path, buffer_size=cfg.extract_buffer_bytes)
+        with writer:
+            count = write_bronze(records, writer, fmt)
+            content_hash = writer.content_hash()
+            prev = _unchanged_since(cfg, adls, state, source, name, content_hash)
+            if prev is not None:
+                writer.discard()
+    else:
+        key = _checkpoint_key(source, name, cfg.run_date)
+        prior = resume["records"] if resume else 0
+
+        def on_block(next_page: int, records: int) -> None:
+            if checkpoints is not None:
+                checkpoints.put(key, {
+                    "blob": blob_path,
+                    "block_ids": writer.block_ids,
+                    "block_hashes": writer.block_hashes,
+                    "next_page": next_page,
+                    "records": prior + records,
+                    **(checkpoint_fields() if checkpoint_fields else {}),
+                })
+
+        writer = adls.open_block_writer(
+            cfg.adls_container,
+            blob_path,
+            buffer_size=None,
+            block_ids=resume["block_ids"] if resume else None,
+            block_hashes=resume["block_hashes"] if resume else None,
+        )
+        with writer:
+            count = prior + write_bronze_pages(pages, writer, fmt, cfg.extract_buffer_bytes, on_block)
+            content_hash = writer.content_hash()
+            prev = _unchanged_since(cfg, adls, state, source, name, content_hash)
+            if prev is not None:
+                writer.discard()
+        if checkpoints is not None:
+            checkpoints.delete(key)
+
+    if prev is not None:
+        log.info("%s unchanged since run_date=%s (records=%s); not committed", blob_path, prev["run_date"], count)
+        entry = {"status": UNCHANGED, "hash": content_hash, "records": count, "blob": prev["blob"], "same_as": prev["run_date"]}
+    else:
+        log.info("Wrote %s records=%s bytes=%s", blob_path, count, writer.bytes_written)
+        entry = {"status": CHANGED, "hash": content_hash, "records": count, "blob": blob_path}
+        if state is not None and state.content_hashes is not None:
+            state.content_hashes.put(endpoint_key, {"hash": content_hash, "blob": blob_path, "records": count, "run_date": cfg.run_date})
+    if state is not None and state.run_manifest is not None:
+        state.run_manifest.put(extract_entry_key(source, name), entry)
+
+    if qc is not None:
+        results = qc.results()
+        text = notify_qc_results(f"QC extract {source}/{name} run_date={cfg.run_date}", results)
+        (log.info if all(r.passed for r in results) else log.warning)("%s", text)
+    return count
+
+
+def extract_superoperator_endpoint(
+    cfg, client: RestApiClient, adls: ADLSClient, ep: dict, watermarks: Optional[WatermarkStore] = None,
+    fmt: str = "jsonl", state: Optional[ExtractState] = None,
+) -> int:
+    name = ep["name"]
+    path = ep["path"]
+    pag_spec = {k: v for k, v in ep.get("pagination", {}).items() if k != "type"}
+    pag = PagePagination(**pag_spec)
+    inc_cfg = None
+    since = None
+    tracker = None
+    wm_key = f"superoperator/{name}"
+    if "incremental" in ep:
+        inc = ep["incremental"]
+        inc_cfg = IncrementalConfig(
+            param=inc["param"],
+            from_days_ago=int(inc.get("from_days_ago", 7)),
+            cursor_field=inc.get("cursor_field", "updated_at"),
+            overlap_minutes=int(inc.get("overlap_minutes", 60)),
+        )
+        if watermarks is not None:
+            since = watermarks.since(wm_key, cfg.run_date)
+            tracker = CursorTracker(inc_cfg.cursor_field)
+
+    request = {"path": path, "pagination": pag_spec, "incremental": ep.get("incremental")}
+    resume = _resume_point(cfg, adls, state, "superoperator", name, fmt, request)
+    if resume is not None:
+        # Replay the original request parameters (incremental window included) from the next page.
+        params, start_page = resume["params"], resume["next_page"]
+        if tracker is not None and resume.get("cursor_max"):
+            tracker.max = parse_cursor(resume["cursor_max"])
+    else:
+        params, start_page = page_params(pag, inc_cfg, since), 1
 
+    log.info("Extracting Superoperator endpoint=%s path=%s since=%s page=%s", name, path, since, start_page)
+    pages = iter_pages(client, path, pag, params, start_page=start_page)
+    if tracker is not None:
+        pages = ((p, list(tracker.track(items))) for p, items in pages)
+
+    def checkpoint_fields() -> dict:
+        cursor = tracker.max.isoformat() if tracker is not None and tracker.max is not None else None
+        return {"request": request, "params": params, "cursor_max": cursor}
+
+    count = _land_bronze(
+        cfg, adls, "superoperator", name, fmt, pages, ep.get("qc"), state, resume, checkpoint_fields
+    )
+
+    # Only advance the watermark once the bronze blob is committed.
+    if tracker is not None and tracker.max is not None:
+        watermarks.advance(wm_key, tracker.max, cfg.run_date, since)
+        log.info("Watermark %s -> %s", wm_key, tracker.max.isoformat())
+    return count
+
+
+def extract_superoperator(
+    cfg, secrets: SecretProvider, adls: ADLSClient, spec: dict, watermarks: Optional[WatermarkStore] = None
+) -> None:
+    client = _superoperator_client(secrets, spec)
     for ep in spec["endpoints"]:
-        name = ep["name"]
-        path = ep["path"]
-        pag = PagePagination(**ep.get("pagination", {}))
-        inc_cfg = None
-        if "incremental" in ep:
-            inc = ep["incremental"]
-            inc_cfg = IncrementalConfig(param=inc["param"], from_days_ago=int(inc.get("from_days_ago", 7)))
+        fmt = bronze_format({"superoperator": spec}, "superoperator", ep["name"])
+        extract_superoperator_endpoint(cfg, client, adls, ep, watermarks, fmt=fmt)
 
-        log.info("Extracting Superoperator endpoint=%s path=%s", name, path)
-        records = iter_paginated(client, path, pag, inc_cfg)
-        jsonl = to_jsonl(records)
 
-        blob_path = f"bronze/superoperator/{name}/run_date={cfg.run_date}/data.jsonl"
-        adls.upload_text(cfg.adls_container, blob_path, jsonl)
-        log.info("Wrote %s", blob_path)
+def _token_store(cfg, secrets: SecretProvider, spec: dict) -> Optional[TokenStore]:
+    """
+    Where rotated QuickBooks tokens are kept between runs: the Key Vault secret named by
+    `auth.token_store_env`, else `{STATE_DIR}/quickbooks_tokens.json` locally, else nowhere.
+    """
+    secret_name = os.getenv(spec["auth"].get("token_store_env", ""))
+    if secret_name:
+        return SecretTokenStore(secrets, secret_name)
+    if cfg.state_dir:
+        return JsonTokenStore(LocalJsonStore(os.path.join(cfg.state_dir, "quickbooks_tokens.json")))
+    return None
 
 
-def extract_quickbooks(cfg, secrets: SecretProvider, adls: ADLSClient, spec: dict) -> None:
+def _quickbooks_client(cfg, secrets: SecretProvider, spec: dict) -> QuickBooksClient:
     company_id = os.environ[spec["auth"]["company_id_env"]]
     env = os.getenv(spec["auth"]["env_env"], "production")
 
@@ -59,33 +332,123 @@ def extract_quickbooks(cfg, secrets: SecretProvider, adls: ADLSClient, spec: dic
         client_secret=client_secret,
         refresh_token=refresh_token,
     )
-    qb = QuickBooksClient(auth=auth, company_id=company_id, env=env)
+    return QuickBooksClient(
+        auth=auth,
+        company_id=company_id,
+        env=env,
+        rate_limit=_rate_limit(spec),
+        token_store=_token_store(cfg, secrets, spec),
+    )
+
+
+def extract_quickbooks_endpoint(
+    cfg, qb: QuickBooksClient, adls: ADLSClient, ep: dict, fmt: str = "jsonl", state: Optional[ExtractState] = None
+) -> int:
+    name = ep["name"]
+    query = ep["query"]
+    pag = QueryPagination(**ep.get("pagination", {}))
+    request = {"query": query, "page_size": pag.page_size}
+    resume = _resume_point(cfg, adls, state, "quickbooks", name, fmt, request)
+    start_page = resume["next_page"] if resume is not None else 1
+    log.info("Extracting QuickBooks endpoint=%s page=%s", name, start_page)
+    pages = qb.iter_query_pages(query, pag, start_page=start_page)
+
+    # Same bronze layout as Superoperator so read_bronze_jsonl handles both sources.
+    return _land_bronze(
+        cfg, adls, "quickbooks", name, fmt, pages, ep.get("qc"), state, resume, lambda: {"request": request}
+    )
+
 
+def extract_quickbooks(cfg, secrets: SecretProvider, adls: ADLSClient, spec: dict) -> None:
+    qb = _quickbooks_client(cfg, secrets, spec)
     for ep in spec["endpoints"]:
-        name = ep["name"]
-        query = ep["query"]
-        log.info("Extracting QuickBooks endpoint=%s", name)
-        data = qb.query(query)
-        blob_path = f"bronze/quickbooks/{name}/run_date={cfg.run_date}/data.json"
-        import json
-        adls.upload_text(cfg.adls_container, blob_path, json.dumps(data, ensure_ascii=False, indent=2))
-        log.info("Wrote %s", blob_path)
+        fmt = bronze_format({"quickbooks": spec}, "quickbooks", ep["name"])
+        extract_quickbooks_endpoint(cfg, qb, adls, ep, fmt=fmt)
+
+
+def _raise(exc: Exception) -> None:
+    raise exc
+
+
+def _source_tasks(
+    source: str, spec: dict, make_client: Callable, extract_endpoint: Callable, cfg, adls, **kwargs
+) -> List[Task]:
+    try:
+        client = make_client()
+    except Exception as e:
+        # Client setup failed (missing env/secret): report every endpoint of this source as failed
+        # without blocking the other source.
+        log.exception("Could not initialise %s client", source)
+        return [Task(ep["name"], source, functools.partial(_raise, e)) for ep in spec["endpoints"]]
+    return [
+        Task(
+            ep["name"],
+            source,
+            functools.partial(
+                extract_endpoint, cfg, client, adls, ep,
+                fmt=bronze_format({source: spec}, source, ep["name"]), **kwargs,
+            ),
+        )
+        for ep in spec["endpoints"]
+    ]
+
+
+def build_extract_tasks(
+    cfg,
+    secrets: SecretProvider,
+    adls: ADLSClient,
+    spec: dict,
+    watermarks: Optional[WatermarkStore] = None,
+    state: Optional[ExtractState] = None,
+) -> List[Task]:
+    tasks: List[Task] = []
+    if "superoperator" in spec:
+        s = spec["superoperator"]
+        tasks += _source_tasks(
+            "superoperator", s, functools.partial(_superoperator_client, secrets, s),
+            extract_superoperator_endpoint, cfg, adls, watermarks=watermarks, state=state,
+        )
+    if "quickbooks" in spec:
+        s = spec["quickbooks"]
+        tasks += _source_tasks(
+            "quickbooks", s, functools.partial(_quickbooks_client, cfg, secrets, s),
+            extract_quickbooks_endpoint, cfg, adls, state=state,
+        )
+    return tasks
 
 
 def main() -> None:
     cfg = get_config()
-    secrets = SecretProvider(cfg.keyvault_url)
+    secrets = make_secret_provider(cfg)
     adls = ADLSClient(cfg.adls_account_url)
 
-    spec_path = os.path.join(os.path.dirname(__file__), "..", "configs", "endpoints.yml")
-    with open(spec_path, "r", encoding="utf-8") as f:
-        spec = yaml.safe_load(f)
+    spec = load_endpoints_spec()
+    # One parallel round of vault lookups up front; endpoint workers then hit the cache.
+    secrets.prefetch(_secret_names(spec))
 
-    if "superoperator" in spec:
-        extract_superoperator(cfg, secrets, adls, spec["superoperator"])
+    # Endpoints are independent: run both sources at once, each capped by its own max_concurrency.
+    watermarks = WatermarkStore(make_state_store(cfg, adls, "watermarks.json"))
+    state = ExtractState(
+        # Staged-block checkpoints: a rerun after a failure continues each endpoint where it stopped.
+        checkpoints=KeyedState(make_state_store(cfg, adls, "extract_checkpoints.json")),
+        # Outputs identical to the last committed one are not committed again and are marked
+        # unchanged in the run manifest, so transform and load skip them.
+        content_hashes=KeyedState(make_state_store(cfg, adls, "content_hashes.json")),
+        run_manifest=KeyedState(make_state_store(cfg, adls, run_manifest_name(cfg.run_date))),
+    )
+    tasks = build_extract_tasks(cfg, secrets, adls, spec, watermarks, state)
+    limits = {src: int(spec[src].get("max_concurrency", DEFAULT_SOURCE_CONCURRENCY)) for src in spec}
+    try:
+        results = run_tasks(tasks, limits)
+    finally:
+        write_metrics("extract", cfg.run_date)
 
-    if "quickbooks" in spec:
-        extract_quickbooks(cfg, secrets, adls, spec["quickbooks"])
+    log.info("Extraction summary for run_date=%s\n%s", cfg.run_date, format_summary(results))
+    failed = [r for r in results if not r.ok]
+    for r in failed:
+        log.error("Endpoint %s/%s failed: %s", r.group, r.name, r.error)
+    if failed:
+        raise SystemExit(f"{len(failed)} endpoint(s) failed for run_date={cfg.run_date}")
 
     log.info("Extraction complete for run_date=%s", cfg.run_date)
 
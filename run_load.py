@@ -1,14 +1,40 @@
 from __future__ import annotations
 
+import functools
+import json
 import os
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Iterable, Optional, Tuple
+
 import yaml
 import pandas as pd
 from sqlalchemy import create_engine, text
 
 from src.config import get_config
 from src.logging_utils import setup_logging
-from src.secrets import SecretProvider
+from src.metrics import get_metrics, write_metrics
+from src.secrets import make_secret_provider
+from azure.core.exceptions import ResourceNotFoundError
+
 from src.adls import ADLSClient
+from src.state import (
+    COMPLETE,
+    UNCHANGED,
+    KeyedState,
+    gold_entry_key,
+    make_state_store,
+    run_manifest_name,
+    stage_entry_key,
+)
+from src.qc.alerts import notify_qc_results
+from src.qc.checks import checks_from_config
+from src.qc.streaming import StreamingQC
+from src.scheduler import Task, format_summary, run_tasks
+from src.sql_bulk import DEFAULT_CHUNK_ROWS, ROW_HASH_COLUMN, bulk_insert_batches
 
 log = setup_logging("load")
 
@@ -30,28 +56,185 @@ def _sqlalchemy_conn_str(server: str, database: str, username: str, password: st
     return f"mssql+pyodbc:///?odbc_connect={quote_plus(params)}"
 
 
-def load_parquet_from_adls(adls: ADLSClient, container: str, prefix: str) -> pd.DataFrame:
+# Parquet blobs downloaded concurrently, and rows per Arrow batch handed to the loader
+DOWNLOAD_WORKERS = int(os.getenv("LOAD_DOWNLOAD_WORKERS", "4"))
+BATCH_ROWS = int(os.getenv("LOAD_BATCH_ROWS", "65536"))
+# Rows per executemany round trip into the staging table
+CHUNK_ROWS = int(os.getenv("LOAD_CHUNK_ROWS", str(DEFAULT_CHUNK_ROWS)))
+# Written next to each gold table by run_transform.write_gold_manifest
+MANIFEST_NAME = "_manifest.json"
+# Columns left out of the row hash because they change on every run without the row changing
+HASH_EXCLUDE = ["etl_loaded_at"]
+
+
+@dataclass
+class MergeCounts:
+    table: str
+    staged: int = 0
+    inserted: int = 0
+    updated: int = 0
+
+    @property
+    def unchanged(self) -> int:
+        return self.staged - self.inserted - self.updated
+
+
+def _download_to_tempfile(adls: ADLSClient, container: str, blob: str) -> str:
+    fd, path = tempfile.mkstemp(suffix=".parquet")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            adls.download_to_file(container, blob, f)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+def iter_parquet_batches(
+    adls: ADLSClient,
+    container: str,
+    prefix: str,
+    max_workers: int = DOWNLOAD_WORKERS,
+    batch_rows: int = BATCH_ROWS,
+    blobs: Optional[list[str]] = None,
+):
     """
-    Loads parquet files under a prefix from ADLS (Blob) into a pandas DataFrame.
-    This is OK for small/medium tables. For large tables, use ADF Copy Activity or Spark JDBC writes.
+    Yield pyarrow RecordBatches for all parquet files under a prefix, or for exactly `blobs`
+    when given (e.g. from a manifest; no container listing then).
+
+    Blobs are downloaded to temp files by a bounded worker pool (at most `max_workers` files
+    in flight or waiting on disk), then read with `ParquetFile.iter_batches`, so memory is
+    bounded by the batch size rather than by the table size. Files are yielded in listing order.
     """
-    blob_names = adls.list_blobs(container, prefix)
+    blob_names = adls.list_blobs(container, prefix) if blobs is None else blobs
     parquet_blobs = [b for b in blob_names if b.endswith(".parquet")]
 
     if not parquet_blobs:
         raise FileNotFoundError(f"No parquet files found under {prefix}")
 
     import pyarrow.parquet as pq
+
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="parquet-dl") as pool:
+        blobs = iter(parquet_blobs)
+        try:
+            for blob in blobs:
+                pending.append(pool.submit(_download_to_tempfile, adls, container, blob))
+                if len(pending) >= max_workers:
+                    break
+            while pending:
+                path = pending.popleft().result()
+                nxt = next(blobs, None)
+                if nxt is not None:
+                    pending.append(pool.submit(_download_to_tempfile, adls, container, nxt))
+                try:
+                    with open(path, "rb") as f:
+                        for batch in pq.ParquetFile(f).iter_batches(batch_size=batch_rows):
+                            yield batch
+                finally:
+                    os.remove(path)
+        finally:
+            # Consumer stopped early or a download failed: cancel queued downloads, wait for the
+            # running ones, then drop the temp files of every download that finished
+            for fut in pending:
+                fut.cancel()
+            wait(pending)
+            for fut in pending:
+                if not fut.cancelled() and fut.exception() is None:
+                    os.remove(fut.result())
+
+
+def load_parquet_from_adls(adls: ADLSClient, container: str, prefix: str) -> pd.DataFrame:
+    """
+    Loads parquet files under a prefix from ADLS (Blob) into a pandas DataFrame.
+    This is OK for small/medium tables. For large tables, stream with `iter_parquet_batches`
+    and `upsert_batches` instead.
+    """
     import pyarrow as pa
 
-    tables = []
-    for blob in parquet_blobs:
-        data = adls.client.get_blob_client(container=container, blob=blob).download_blob().readall()
-        table = pq.read_table(pa.BufferReader(data))
-        tables.append(table)
+    return pa.Table.from_batches(list(iter_parquet_batches(adls, container, prefix))).to_pandas()
 
-    merged = pa.concat_tables(tables)
-    return merged.to_pandas()
+
+def _staging_table(table_name: str) -> Tuple[str | None, str]:
+    """
+    "dbo.fact_payments" -> ("dbo", "tmp_fact_payments"); the staging table lives next to the target.
+    """
+    schema, _, name = table_name.rpartition(".")
+    return (schema or None), f"tmp_{name}"
+
+
+def _qualified(schema: str | None, name: str) -> str:
+    return f"{schema}.{name}" if schema else name
+
+
+def _ensure_row_hash_column(engine, table_name: str) -> None:
+    if engine.dialect.name == "mssql":
+        sql = (
+            f"IF COL_LENGTH('{table_name}', '{ROW_HASH_COLUMN}') IS NULL "
+            f"ALTER TABLE {table_name} ADD {ROW_HASH_COLUMN} BIGINT NULL;"
+        )
+        with engine.begin() as conn:
+            conn.execute(text(sql))
+        return
+    from sqlalchemy import inspect
+
+    schema, _, name = table_name.rpartition(".")
+    existing = {c["name"] for c in inspect(engine).get_columns(name, schema=schema or None)}
+    if ROW_HASH_COLUMN not in existing:
+        with engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {ROW_HASH_COLUMN} INTEGER;"))
+
+
+def _merge_from_staging(engine, table_name: str, tmp: str, columns: list[str], key_cols: list[str]) -> MergeCounts:
+    """
+    Merge staging into target. When staging carries `row_hash`, matched rows are only updated if
+    their stored hash differs, so unchanged rows cost no writes.
+    """
+    on_clause = " AND ".join([f"t.{c}=s.{c}" for c in key_cols])
+    update_cols = [c for c in columns if c not in key_cols]
+    set_clause = ", ".join([f"t.{c}=s.{c}" for c in update_cols])
+    insert_cols = ", ".join(columns)
+    insert_vals = ", ".join([f"s.{c}" for c in columns])
+    changed = (
+        f" AND (t.{ROW_HASH_COLUMN} IS NULL OR t.{ROW_HASH_COLUMN} <> s.{ROW_HASH_COLUMN})"
+        if ROW_HASH_COLUMN in columns else ""
+    )
+    counts = MergeCounts(table_name)
+
+    with engine.begin() as conn:
+        counts.staged = conn.execute(text(f"SELECT COUNT(*) FROM {tmp};")).scalar()
+        if engine.dialect.name == "mssql":
+            # Build MERGE statement; OUTPUT $action gives insert/update counts in the same batch
+            merge_sql = f"""
+            SET NOCOUNT ON;
+            DECLARE @actions TABLE (action NVARCHAR(10));
+            MERGE INTO {table_name} AS t
+            USING {tmp} AS s
+              ON {on_clause}
+            WHEN MATCHED{changed} THEN
+              UPDATE SET {set_clause}
+            WHEN NOT MATCHED THEN
+              INSERT ({insert_cols}) VALUES ({insert_vals})
+            OUTPUT $action INTO @actions;
+            SELECT
+              COALESCE(SUM(CASE WHEN action = 'INSERT' THEN 1 ELSE 0 END), 0),
+              COALESCE(SUM(CASE WHEN action = 'UPDATE' THEN 1 ELSE 0 END), 0)
+            FROM @actions;
+            """
+            counts.inserted, counts.updated = conn.execute(text(merge_sql)).fetchone()
+        else:
+            # Local stand-ins (SQLite) have no MERGE: update changed matches, then insert the rest
+            if update_cols:
+                sqlite_set = ", ".join([f"{c}=s.{c}" for c in update_cols])
+                counts.updated = conn.execute(
+                    text(f"UPDATE {table_name} AS t SET {sqlite_set} FROM {tmp} AS s WHERE {on_clause}{changed};")
+                ).rowcount
+            counts.inserted = conn.execute(text(
+                f"INSERT INTO {table_name} ({insert_cols}) SELECT {insert_vals} FROM {tmp} AS s "
+                f"WHERE NOT EXISTS (SELECT 1 FROM {table_name} AS t WHERE {on_clause});"
+            )).rowcount
+        conn.execute(text(f"DROP TABLE {tmp};"))
+    return counts
 
 
 def upsert_dataframe(engine, df: pd.DataFrame, table_name: str, key_cols: list[str]) -> None:
@@ -69,64 +252,219 @@ def upsert_dataframe(engine, df: pd.DataFrame, table_name: str, key_cols: list[s
         log.warning("Skipping %s because dataframe is empty", table_name)
         return
 
-    tmp = f"tmp_{table_name}"
-    df.to_sql(tmp, engine, if_exists="replace", index=False)
+    import pyarrow as pa
 
-    # Build MERGE statement
-    on_clause = " AND ".join([f"t.{c}=s.{c}" for c in key_cols])
-    update_cols = [c for c in df.columns if c not in key_cols]
-    set_clause = ", ".join([f"t.{c}=s.{c}" for c in update_cols])
-    insert_cols = ", ".join(df.columns)
-    insert_vals = ", ".join([f"s.{c}" for c in df.columns])
+    upsert_batches(engine, pa.Table.from_pandas(df, preserve_index=False).to_batches(), table_name, key_cols)
 
-    merge_sql = f"""
-    MERGE INTO {table_name} AS t
-    USING {tmp} AS s
-      ON {on_clause}
-    WHEN MATCHED THEN
-      UPDATE SET {set_clause}
-    WHEN NOT MATCHED THEN
-      INSERT ({insert_cols}) VALUES ({insert_vals});
+
+def upsert_batches(
+    engine,
+    batches: Iterable,
+    table_name: str,
+    key_cols: list[str],
+    chunk_rows: int = CHUNK_ROWS,
+    hash_exclude: Optional[list[str]] = None,
+    before_merge: Optional[Callable[[], None]] = None,
+) -> MergeCounts:
     """
+    Same upsert as `upsert_dataframe`, fed with Arrow record batches: the staging table is created
+    from the Arrow schema and filled in `chunk_rows` chunks (see `sql_bulk.bulk_insert_batches`).
 
-    with engine.begin() as conn:
-        conn.execute(text(merge_sql))
-        conn.execute(text(f"DROP TABLE {tmp};"))
+    Each staged row gets a `row_hash` (all columns except `hash_exclude`), which is stored in the
+    target and used to skip matched rows that did not change.
+
+    `before_merge` runs after staging and before the MERGE; if it raises, the staging table is
+    dropped and the target is left untouched.
+    """
+    hash_exclude = HASH_EXCLUDE if hash_exclude is None else hash_exclude
+    schema, tmp = _staging_table(table_name)
+    staging = _qualified(schema, tmp)
+    stats = bulk_insert_batches(engine, staging, batches, chunk_rows=chunk_rows, hash_exclude=hash_exclude)
+    log.info(
+        "Staged %s rows into %s in %.2fs (%.0f rows/s)", stats.rows, staging, stats.seconds, stats.rows_per_second
+    )
+
+    if stats.rows == 0:
+        log.warning("Skipping %s because there are no rows", table_name)
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {staging};"))
+        return MergeCounts(table_name)
+
+    if before_merge is not None:
+        try:
+            before_merge()
+        except Exception:
+            with engine.begin() as conn:
+                conn.execute(text(f"DROP TABLE IF EXISTS {staging};"))
+            raise
+
+    _ensure_row_hash_column(engine, table_name)
+    merge_start = time.perf_counter()
+    counts = _merge_from_staging(engine, table_name, staging, stats.columns, key_cols)
+    metrics = get_metrics()
+    metrics.observe("sql_stage_seconds", stats.seconds, table=table_name)
+    metrics.observe("sql_merge_seconds", time.perf_counter() - merge_start, table=table_name)
+    metrics.inc("sql_rows_staged", counts.staged, table=table_name)
+    metrics.inc("sql_rows_inserted", counts.inserted, table=table_name)
+    metrics.inc("sql_rows_updated", counts.updated, table=table_name)
+    log.info(
+        "Upserted %s rows into %s: inserted=%s updated=%s unchanged=%s",
+        counts.staged, table_name, counts.inserted, counts.updated, counts.unchanged,
+    )
+    return counts
+
+
+def load_plan_spec(path: Optional[str] = None) -> dict:
+    path = path or os.path.join(os.path.dirname(__file__), "..", "configs", "load_plan.yml")
+    with open(path, "r", encoding="utf-8") as f:
+        return yaml.safe_load(f)
+
+
+def read_manifest(adls: ADLSClient, container: str, prefix: str) -> Optional[dict]:
+    try:
+        return json.loads(adls.download_text(container, f"{prefix.rstrip('/')}/{MANIFEST_NAME}"))
+    except ResourceNotFoundError:
+        return None
+
+
+class QCFailed(RuntimeError):
+    pass
 
-    log.info("Upserted %s rows into %s", len(df), table_name)
+
+def _upsert_with_qc(engine, batches: Iterable, item: dict, run_date: str) -> MergeCounts:
+    """
+    Upsert with the table's `qc` checks evaluated on the staging stream. With `qc_blocking: true`
+    a failing check stops the MERGE.
+    """
+    table = item["table"]
+    if not item.get("qc"):
+        return upsert_batches(engine, batches, table, item["keys"])
+
+    qc = StreamingQC(checks_from_config(item["qc"]))
+
+    def gate() -> None:
+        results = qc.results()
+        text = notify_qc_results(f"QC load {table} run_date={run_date}", results)
+        if all(r.passed for r in results):
+            log.info("%s", text)
+            return
+        log.warning("%s", text)
+        if item.get("qc_blocking"):
+            raise QCFailed(f"QC failed for {table}; MERGE skipped")
+
+    return upsert_batches(engine, qc.observe_batches(batches), table, item["keys"], before_merge=gate)
+
+
+def load_table(
+    engine,
+    adls: ADLSClient,
+    container: str,
+    item: dict,
+    run_date: str,
+    load_state: Optional[KeyedState] = None,
+    run_manifest: Optional[dict] = None,
+) -> MergeCounts:
+    """
+    Load one gold table, driven by its transform manifest when there is one:
+    - table content hash equal to the last successful load -> nothing to do
+    - otherwise only files whose content hash was not part of the last load are fetched
+    Without a manifest every parquet file under the prefix is loaded.
+
+    A table the run manifest marks unchanged has no gold of its own for `run_date`; the earlier
+    run_date it equals (`same_as`) is read instead, which the content-hash check usually skips.
+    """
+    table = item["table"]
+    entry = (run_manifest or {}).get(gold_entry_key(table)) or {}
+    gold_run_date = entry.get("same_as") if entry.get("status") == UNCHANGED else None
+    if gold_run_date:
+        log.info("%s: gold unchanged since run_date=%s", table, gold_run_date)
+    prefix = item["prefix"].format(run_date=gold_run_date or run_date)
+    manifest = read_manifest(adls, container, prefix)
+    if manifest is None:
+        log.warning("No %s under %s; loading every parquet file", MANIFEST_NAME, prefix)
+        return _upsert_with_qc(engine, iter_parquet_batches(adls, container, prefix), item, run_date)
+
+    last = load_state.get(table) if load_state is not None else None
+    if last and last.get("content_hash") == manifest["content_hash"]:
+        log.info("%s unchanged since run_date=%s; skipping", table, last.get("run_date"))
+        return MergeCounts(table)
+
+    loaded = set(last.get("file_hashes", [])) if last else set()
+    new_files = [f["path"] for f in manifest["files"] if f["content_hash"] not in loaded]
+    log.info("%s: %s of %s files to load", table, len(new_files), len(manifest["files"]))
+    counts = MergeCounts(table)
+    if new_files:
+        batches = iter_parquet_batches(adls, container, prefix, blobs=new_files)
+        counts = _upsert_with_qc(engine, batches, item, run_date)
+
+    if load_state is not None:
+        load_state.put(table, {
+            "content_hash": manifest["content_hash"],
+            "file_hashes": sorted(f["content_hash"] for f in manifest["files"]),
+            "rows": manifest["rows"],
+            "run_date": run_date,
+        })
+    return counts
+
+
+def build_load_tasks(
+    engine,
+    adls: ADLSClient,
+    container: str,
+    plan: dict,
+    run_date: str,
+    load_state: Optional[KeyedState] = None,
+    run_manifest: Optional[dict] = None,
+) -> list[Task]:
+    return [
+        Task(
+            item["table"],
+            "sql",
+            functools.partial(load_table, engine, adls, container, item, run_date, load_state, run_manifest),
+            depends_on=list(item.get("depends_on", [])),
+        )
+        for item in plan["tables"]
+    ]
 
 
 def main() -> None:
     cfg = get_config()
-    secrets = SecretProvider(cfg.keyvault_url)
+    secrets = make_secret_provider(cfg)
     adls = ADLSClient(cfg.adls_account_url)
+    plan = load_plan_spec()
 
     # SQL creds from Key Vault
-    username = secrets.get_secret(os.environ.get("AZURESQL_USERNAME_SECRET_NAME", ""))
-    password = secrets.get_secret(os.environ.get("AZURESQL_PASSWORD_SECRET_NAME", ""))
+    username_secret = os.environ.get("AZURESQL_USERNAME_SECRET_NAME", "")
+    password_secret = os.environ.get("AZURESQL_PASSWORD_SECRET_NAME", "")
+    secrets.prefetch([username_secret, password_secret])
+    username = secrets.get_secret(username_secret)
+    password = secrets.get_secret(password_secret)
 
     conn_str = _sqlalchemy_conn_str(cfg.azuresql_server, cfg.azuresql_database, username, password)
-    engine = create_engine(conn_str, fast_executemany=True)
-
-    # Example loading: gold dim_customers + fact_payments
-    # Adjust key columns based on your real schema
-    load_plan = [
-        {
-            "table": "dbo.dim_customers",
-            "prefix": f"gold/core/dim_customers/run_date={cfg.run_date}/",
-            "keys": ["id"]
-        },
-        {
-            "table": "dbo.fact_payments",
-            "prefix": f"gold/finance/fact_payments/run_date={cfg.run_date}/",
-            "keys": ["payment_id"] if True else ["id"]
-        },
-    ]
+    # One pooled engine shared by all table workers; each worker uses one connection at a time,
+    # so pool_size >= max_concurrency avoids waiting on the pool.
+    pool_size = int(os.getenv("AZURESQL_POOL_SIZE", plan.get("pool_size", 4)))
+    engine = create_engine(conn_str, fast_executemany=True, pool_size=pool_size, max_overflow=0, pool_pre_ping=True)
+
+    load_state = KeyedState(make_state_store(cfg, adls, "load_state.json"))
+    manifest_store = make_state_store(cfg, adls, run_manifest_name(cfg.run_date))
+    run_state = KeyedState(manifest_store)
+    run_state.delete(stage_entry_key("load"))
+    tasks = build_load_tasks(engine, adls, cfg.adls_container, plan, cfg.run_date, load_state, manifest_store.read())
+    try:
+        results = run_tasks(tasks, {"sql": int(plan.get("max_concurrency", 2))})
+    finally:
+        write_metrics("load", cfg.run_date)
 
-    for item in load_plan:
-        df = load_parquet_from_adls(adls, cfg.adls_container, item["prefix"])
-        upsert_dataframe(engine, df, item["table"], item["keys"])
+    log.info("Load summary for run_date=%s\n%s", cfg.run_date, format_summary(results))
+    failed = [r for r in results if not r.ok]
+    for r in failed:
+        log.error("Table %s %s: %s", r.name, r.status, r.error)
+    if failed:
+        raise SystemExit(f"{len(failed)} table(s) not loaded for run_date={cfg.run_date}")
 
+    # Later extracts may only treat their output as unchanged against a run_date that got here
+    run_state.put(stage_entry_key("load"), {"status": COMPLETE})
     log.info("Load complete for run_date=%s", cfg.run_date)
 
 
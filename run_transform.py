@@ -4,29 +4,116 @@ PySpark transformations for bronze -> silver -> gold.
 Typical Databricks usage:
   spark-submit pipelines/run_transform.py --run-date 2026-02-01
 
-This script assumes bronze JSONL/JSON files are already in ADLS/Blob.
+This script assumes bronze files are already in ADLS/Blob. The bronze format of each
+endpoint (jsonl, jsonl.gz, jsonl.zst or parquet) is taken from configs/endpoints.yml.
 """
 from __future__ import annotations
 
 import argparse
-import os
-from typing import Dict, List
-
-from pyspark.sql import SparkSession, DataFrame
-from pyspark.sql.functions import col, to_timestamp, lit, current_timestamp
-
-from src.logging_utils import setup_logging
+import hashlib
+import json
+from typing import Dict, List, Optional
+
+from pyspark import StorageLevel
+from pyspark.sql import SparkSession, DataFrame, Window
+from pyspark.sql import functions as F
+from pyspark.sql.functions import col, to_timestamp, lit, current_timestamp, pmod, row_number, xxhash64
+from pyspark.sql.types import StructType
+from pyspark.sql.utils import AnalysisException
+
+from src.bronze import DEFAULT_FORMAT, bronze_blob_path, bronze_format, load_endpoints_spec
+from src.logging_utils import log_stage, setup_logging
+from src.metrics import write_metrics
+from src.qc.alerts import notify_qc_results
+from src.qc.checks import checks_from_config, load_qc_spec
+from src.qc.spark_checks import run_suite_spark
+from src.schema_registry import SchemaRegistry, infer_schema_from_sample, schema_drift
+from src.state import (
+    CHANGED,
+    COMPLETE,
+    UNCHANGED,
+    extract_entry_key,
+    gold_entry_key,
+    is_unchanged,
+    run_manifest_name,
+    stage_entry_key,
+    unchanged_since,
+)
+from src.transform_spec import (
+    CHANGE_ORDER_COLS,
+    CUSTOMERS_KEY,
+    GOLD_INPUTS,
+    GOLD_KEYS,
+    MANIFEST_NAME,
+    PAYMENTS_KEY,
+    VOLATILE_COLS,
+)
 
 log = setup_logging("transform")
 
 
-def read_bronze_jsonl(spark: SparkSession, adls_abfss_prefix: str, source: str, endpoint: str, run_date: str) -> DataFrame:
-    path = f"{adls_abfss_prefix}/bronze/{source}/{endpoint}/run_date={run_date}/data.jsonl"
-    # For JSONL, Spark can read as json lines
-    return spark.read.json(path)
-
+def read_bronze_jsonl(
+    spark: SparkSession,
+    adls_abfss_prefix: str,
+    source: str,
+    endpoint: str,
+    run_date: str,
+    fmt: str = DEFAULT_FORMAT,
+    schema: Optional[StructType] = None,
+    blob: Optional[str] = None,
+) -> DataFrame:
+    # `blob` overrides the run_date path, e.g. an earlier run's identical bronze file
+    path = f"{adls_abfss_prefix}/{blob or bronze_blob_path(source, endpoint, run_date, fmt)}"
+    if fmt == "parquet":
+        # Schema comes from the parquet footer, no inference pass
+        df = spark.read.parquet(path)
+        return df.select(*[col(f.name).cast(f.dataType) for f in schema.fields]) if schema else df
+    # For JSONL, Spark can read as json lines; .gz/.zst are decompressed by the Hadoop codec for the extension.
+    # With a registered schema Spark skips the full inference scan and column types stay stable across runs.
+    reader = spark.read.schema(schema) if schema else spark.read
+    return reader.json(path)
+
+
+def load_bronze(
+    spark: SparkSession,
+    adls_abfss_prefix: str,
+    spec: dict,
+    registry: SchemaRegistry,
+    source: str,
+    endpoint: str,
+    run_date: str,
+    register: bool = False,
+    blob: Optional[str] = None,
+) -> DataFrame:
+    """
+    Read a bronze endpoint with its registered schema, logging any drift found in a small sample.
 
-def write_parquet(df: DataFrame, adls_abfss_prefix: str, layer: str, domain: str, table: str, run_date: str) -> None:
+    With `register=True` the sampled schema is stored as a new version when it differs (or when
+    nothing is registered yet), and used for this read. `blob` is set when the extract found the
+    day's data identical to an earlier run's; that file was already checked for drift then.
+    """
+    fmt = bronze_format(spec, source, endpoint)
+    path = f"{adls_abfss_prefix}/{blob or bronze_blob_path(source, endpoint, run_date, fmt)}"
+    registered = registry.get(source, endpoint)
+
+    if registered is None or register:
+        sampled = infer_schema_from_sample(spark, path, fmt)
+        if register:
+            version = registry.register(source, endpoint, sampled)
+            log.info("Schema %s/%s registered as v%s", source, endpoint, version)
+            registered = sampled
+        elif registered is None:
+            log.warning("No registered schema for %s/%s; using sampled schema (run with --register-schemas)", source, endpoint)
+            registered = sampled
+    elif blob is None:
+        issues = schema_drift(registered, infer_schema_from_sample(spark, path, fmt))
+        for issue in issues:
+            log.warning("Schema drift %s/%s: %s", source, endpoint, issue)
+
+    return read_bronze_jsonl(spark, adls_abfss_prefix, source, endpoint, run_date, fmt, schema=registered, blob=blob)
+
+
+def write_parquet(df: DataFrame, adls_abfss_prefix: str, layer: str, domain: str, table: str, run_date: str) -> str:
     out = f"{adls_abfss_prefix}/{layer}/{domain}/{table}/run_date={run_date}/"
     (
         df.write
@@ -34,25 +121,144 @@ def write_parquet(df: DataFrame, adls_abfss_prefix: str, layer: str, domain: str
         .parquet(out)
     )
     log.info("Wrote %s", out)
+    return out
+
+
+# Cumulative (incremental mode) tables are bucketed by key hash; a day's changes only touch their buckets.
+KEY_BUCKETS = 64
+
+
+def _read_text(spark: SparkSession, path: str) -> Optional[str]:
+    jvm = spark.sparkContext._jvm
+    hpath = jvm.org.apache.hadoop.fs.Path(path)
+    fs = hpath.getFileSystem(spark.sparkContext._jsc.hadoopConfiguration())
+    if not fs.exists(hpath):
+        return None
+    reader = jvm.java.io.BufferedReader(jvm.java.io.InputStreamReader(fs.open(hpath), "UTF-8"))
+    try:
+        return "\n".join(iter(reader.readLine, None))
+    finally:
+        reader.close()
+
+
+def _write_text(spark: SparkSession, path: str, text: str) -> None:
+    # Small single-file write through the Hadoop FS API (works for abfss:// and local paths)
+    jvm = spark.sparkContext._jvm
+    hpath = jvm.org.apache.hadoop.fs.Path(path)
+    fs = hpath.getFileSystem(spark.sparkContext._jsc.hadoopConfiguration())
+    out = fs.create(hpath, True)
+    try:
+        out.write(bytearray(text.encode("utf-8")))
+    finally:
+        out.close()
+
+
+def _delete_path(spark: SparkSession, path: str) -> None:
+    # Recursive delete through the Hadoop FS API; a missing path is not an error
+    jvm = spark.sparkContext._jvm
+    hpath = jvm.org.apache.hadoop.fs.Path(path)
+    hpath.getFileSystem(spark.sparkContext._jsc.hadoopConfiguration()).delete(hpath, True)
+
+
+def write_gold_manifest(spark: SparkSession, out: str, adls_abfss_prefix: str, key: Optional[str]) -> dict:
+    """
+    Describe a written gold table in `{out}/_manifest.json` so the loader can skip unchanged
+    tables and fetch exactly the listed files without listing the container.
+
+    One aggregation over the written files gives, per file: rows, key min/max and an
+    order-independent content hash (sum of xxhash64 over non-volatile columns). The table
+    content hash combines them and is independent of file names and partitioning.
+    """
+    df = spark.read.parquet(out)
+    hash_cols = [c for c in df.columns if c not in VOLATILE_COLS]
+    row_hash = xxhash64(*[col(c) for c in hash_cols]).cast("decimal(38,0)") if hash_cols else lit(0)
+    aggs = [F.count(lit(1)).alias("rows"), F.sum(row_hash).alias("hash_sum")]
+    if key and key in df.columns:
+        aggs += [F.min(col(key)).alias("key_min"), F.max(col(key)).alias("key_max")]
+    per_file = df.groupBy(F.input_file_name().alias("file")).agg(*aggs).collect()
+
+    # Paths in the manifest are relative to the container, like the blob names ADLSClient uses
+    root = adls_abfss_prefix.rstrip("/") + "/"
+    files = []
+    for r in sorted(per_file, key=lambda r: r.file):
+        entry = {
+            "path": r.file[len(root):] if r.file.startswith(root) else r.file,
+            "rows": r.rows,
+            "content_hash": hashlib.sha256(f"{r.rows}:{r.hash_sum}".encode()).hexdigest(),
+        }
+        if "key_min" in r.asDict():
+            entry["key_min"] = None if r.key_min is None else str(r.key_min)
+            entry["key_max"] = None if r.key_max is None else str(r.key_max)
+        files.append(entry)
+
+    total_rows = sum(f["rows"] for f in files)
+    total_hash = sum(int(r.hash_sum or 0) for r in per_file)
+    manifest = {
+        "key": key,
+        "columns": df.columns,
+        "rows": total_rows,
+        "content_hash": hashlib.sha256(f"{total_rows}:{total_hash}".encode()).hexdigest(),
+        "files": files,
+    }
+    _write_text(spark, f"{out.rstrip('/')}/{MANIFEST_NAME}", json.dumps(manifest, indent=2, default=str))
+    return manifest
+
+
+# --silver-cache choices: a Spark storage level, "readback" (re-read the written silver parquet) or "none"
+SILVER_CACHE_MODES = ("MEMORY_AND_DISK", "MEMORY_ONLY", "DISK_ONLY", "readback", "none")
+
+
+def write_silver(
+    spark: SparkSession, df: DataFrame, adls_abfss_prefix: str, domain: str, table: str, run_date: str, cache: str
+) -> DataFrame:
+    """
+    Write a silver table and return a DataFrame that gold can reuse without recomputing
+    bronze reads, dedup and casts:
+    - storage level: persist before the write, so the write itself fills the cache
+    - "readback": read the parquet that was just written
+    - "none": return the lazy plan unchanged (recomputed by every gold write)
+    """
+    if cache not in ("readback", "none"):
+        df = df.persist(getattr(StorageLevel, cache))
+    out = write_parquet(df, adls_abfss_prefix, "silver", domain, table, run_date)
+    if cache == "readback":
+        return spark.read.parquet(out)
+    return df
+
+
+def _order_col(df: DataFrame) -> Optional[str]:
+    return next((c for c in CHANGE_ORDER_COLS if c in df.columns), None)
+
+
+def _dedupe_latest(df: DataFrame, key: str) -> DataFrame:
+    """
+    One row per key: the latest by the first available change-order column, or an arbitrary one
+    if the table has none.
+    """
+    order = _order_col(df)
+    if order is None:
+        return df.dropDuplicates([key])
+    w = Window.partitionBy(key).orderBy(col(order).desc_nulls_last())
+    return df.withColumn("_rn", row_number().over(w)).where(col("_rn") == 1).drop("_rn")
 
 
 def clean_customers(bronze: DataFrame) -> DataFrame:
     """
     Example cleaning:
-    - Deduplicate by id (if present)
     - Cast typical fields
+    - Deduplicate by id (if present), keeping the latest updated_at
     - Standardize names/emails
     """
     df = bronze
 
     # Common patterns, adjust to your real schema
-    if "id" in df.columns:
-        df = df.dropDuplicates(["id"])
-
     for c in ("created_at", "updated_at"):
         if c in df.columns:
             df = df.withColumn(c, to_timestamp(col(c)))
 
+    if CUSTOMERS_KEY in df.columns:
+        df = _dedupe_latest(df, CUSTOMERS_KEY)
+
     if "email" in df.columns:
         df = df.withColumn("email", col("email").cast("string"))
 
@@ -62,17 +268,104 @@ def clean_customers(bronze: DataFrame) -> DataFrame:
 
 def clean_payments(bronze: DataFrame) -> DataFrame:
     df = bronze
-    if "payment_id" in df.columns:
-        df = df.dropDuplicates(["payment_id"])
     if "amount" in df.columns:
         df = df.withColumn("amount", col("amount").cast("double"))
-    for c in ("created_at", "paid_at"):
+    for c in ("created_at", "paid_at", "updated_at"):
         if c in df.columns:
             df = df.withColumn(c, to_timestamp(col(c)))
+    if PAYMENTS_KEY in df.columns:
+        df = _dedupe_latest(df, PAYMENTS_KEY)
     df = df.withColumn("etl_loaded_at", current_timestamp())
     return df
 
 
+def merge_staging_path(adls_abfss_prefix: str, domain: str, table: str, run_date: str) -> str:
+    """Materialized merge result of `merge_cumulative`; delete it once the run's gold is written."""
+    return f"{adls_abfss_prefix}/silver/{domain}/{table}/_merge_staging/run_date={run_date}"
+
+
+def merge_cumulative(
+    spark: SparkSession,
+    changes: DataFrame,
+    adls_abfss_prefix: str,
+    domain: str,
+    table: str,
+    key: str,
+    run_date: str,
+    buckets: int = KEY_BUCKETS,
+) -> DataFrame:
+    """
+    Merge a day's cleaned records into the cumulative table `silver/{domain}/{table}/current/`,
+    keeping the latest row per key (same ordering as `_dedupe_latest`).
+
+    The table is partitioned by `key_bucket = pmod(xxhash64(key), buckets)`. Only buckets that
+    appear in `changes` are read, and only those holding an effective change are rewritten
+    (dynamic partition overwrite); the rest of the table is untouched, so cost follows the
+    change volume. An incoming record whose non-volatile content equals the stored row is not
+    a change, so re-fetched snapshot rows cost nothing downstream.
+
+    Returns the records from `changes` that won the merge (the effective changes for the day),
+    without the bucket column. They are read from `merge_staging_path`, which the caller
+    deletes when it no longer needs them.
+    """
+    if key not in changes.columns:
+        log.warning("Cannot merge %s incrementally: key column %s missing", table, key)
+        return changes
+
+    current = f"{adls_abfss_prefix}/silver/{domain}/{table}/current"
+    staging = merge_staging_path(adls_abfss_prefix, domain, table, run_date)
+
+    changes = (
+        changes
+        .withColumn("key_bucket", pmod(xxhash64(col(key)), lit(buckets)).cast("int"))
+        .withColumn("_is_change", lit(True))
+    )
+    affected = [r.key_bucket for r in changes.select("key_bucket").distinct().collect()]
+    if not affected:
+        return changes.drop("key_bucket", "_is_change")
+
+    try:
+        existing = spark.read.parquet(current).where(col("key_bucket").isin(affected))
+        combined = changes.unionByName(existing.withColumn("_is_change", lit(False)), allowMissingColumns=True)
+        # Drop incoming records identical to the stored row (ignoring volatile columns)
+        content = [c for c in combined.columns if c not in VOLATILE_COLS and c not in ("key_bucket", "_is_change")]
+        combined = combined.withColumn("_row_hash", xxhash64(*[col(c) for c in content]))
+        stored_hash = F.max(F.when(~col("_is_change"), col("_row_hash"))).over(Window.partitionBy(key))
+        combined = (
+            combined.withColumn("_stored_hash", stored_hash)
+            .where(~(col("_is_change") & col("_row_hash").eqNullSafe(col("_stored_hash"))))
+            .drop("_row_hash", "_stored_hash")
+        )
+    except AnalysisException as e:  # first run: no cumulative table yet
+        if "Path does not exist" not in str(e):
+            raise
+        combined = changes
+
+    order = _order_col(combined)
+    ordering = [col(order).desc_nulls_last()] if order else []
+    # On ties the incoming record wins (identical ones were dropped above)
+    w = Window.partitionBy(key).orderBy(*ordering, col("_is_change").desc())
+    merged = combined.withColumn("_rn", row_number().over(w)).where(col("_rn") == 1).drop("_rn")
+
+    # Materialize first: Spark cannot overwrite partitions of a path it is reading in the same job.
+    merged.write.mode("overwrite").parquet(staging)
+    merged = spark.read.parquet(staging)
+    changed = [r.key_bucket for r in merged.where(col("_is_change")).select("key_bucket").distinct().collect()]
+    if changed:
+        (
+            merged.where(col("key_bucket").isin(changed))
+            .drop("_is_change")
+            .write
+            .mode("overwrite")
+            .option("partitionOverwriteMode", "dynamic")
+            .partitionBy("key_bucket")
+            .parquet(current)
+        )
+    log.info("Merged %s of %s incoming buckets into %s", len(changed), len(affected), current)
+
+    return merged.where(col("_is_change")).drop("key_bucket", "_is_change")
+
+
 def gold_facts(customers_silver: DataFrame, payments_silver: DataFrame) -> Dict[str, DataFrame]:
     """
     Example gold tables:
@@ -92,32 +385,168 @@ def gold_facts(customers_silver: DataFrame, payments_silver: DataFrame) -> Dict[
     }
 
 
+def gold_qc_passed(table_name: str, df: DataFrame, qc_spec: dict, refs: Dict[str, DataFrame], run_date: str) -> bool:
+    """
+    Run the table's configured checks in one Spark aggregation. Returns False only when a
+    check failed and the table is marked `blocking`.
+    """
+    table_spec = qc_spec.get("tables", {}).get(table_name)
+    if not table_spec or not table_spec.get("checks"):
+        return True
+    results = run_suite_spark(df, checks_from_config(table_spec["checks"]), refs=refs)
+    text = notify_qc_results(f"QC gold {table_name} run_date={run_date}", results)
+    if all(r.passed for r in results):
+        log.info("%s", text)
+        return True
+    log.warning("%s", text)
+    return not table_spec.get("blocking", False)
+
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--run-date", required=True, help="YYYY-MM-DD")
     parser.add_argument("--abfss-prefix", required=True, help="Example: abfss://container@account.dfs.core.windows.net")
+    parser.add_argument("--endpoints-config", default=None, help="Path to endpoints.yml (default: configs/endpoints.yml)")
+    parser.add_argument("--schemas-dir", default=None, help="Schema registry root (default: configs/schemas)")
+    parser.add_argument(
+        "--register-schemas", action="store_true",
+        help="Sample today's bronze and store a new schema version where it changed",
+    )
+    parser.add_argument(
+        "--mode", choices=("snapshot", "incremental"), default="snapshot",
+        help="incremental: merge the day's records into cumulative silver tables and publish only effective changes",
+    )
+    parser.add_argument(
+        "--silver-cache", choices=SILVER_CACHE_MODES, default="MEMORY_AND_DISK",
+        help="How silver results are reused by the gold stage",
+    )
+    parser.add_argument("--qc-config", default=None, help="Gold QC rules (default: configs/qc.yml)")
+    parser.add_argument(
+        "--run-manifest", default=None,
+        help="Extract run manifest used to skip unchanged inputs (default: {abfss-prefix}/_state/runs/run_date=...json)",
+    )
     args = parser.parse_args()
 
+    try:
+        run_transform(args)
+    finally:
+        write_metrics("transform", args.run_date)
+
+
+def read_run_manifest(spark: SparkSession, path: str) -> dict:
+    """The extract's run manifest (see src.state); empty when missing, i.e. treat everything as changed."""
+    text = _read_text(spark, path)
+    return json.loads(text) if text else {}
+
+
+def run_transform(args: argparse.Namespace) -> None:
     run_date = args.run_date
     prefix = args.abfss_prefix.rstrip("/")
+    spec = load_endpoints_spec(args.endpoints_config)
+    registry = SchemaRegistry(args.schemas_dir)
 
     spark = SparkSession.builder.appName("superoperator-etl-transform").getOrCreate()
 
+    manifest_path = args.run_manifest or f"{prefix}/_state/{run_manifest_name(run_date)}"
+    manifest = read_run_manifest(spark, manifest_path)
+
+    def bronze_blob(source: str, endpoint: str) -> Optional[str]:
+        key = extract_entry_key(source, endpoint)
+        return manifest[key].get("blob") if is_unchanged(manifest, key) else None
+
+    # Gold table -> earlier run_date whose gold it equals (all inputs unchanged since then), else None
+    unchanged = {
+        table: unchanged_since(manifest, [extract_entry_key(*i) for i in inputs])
+        for table, inputs in GOLD_INPUTS.items()
+    }
+    if all(unchanged.values()):
+        log.info("All bronze inputs unchanged for run_date=%s; nothing to transform", run_date)
+        for table, same_as in unchanged.items():
+            manifest[gold_entry_key(table)] = {"status": UNCHANGED, "same_as": same_as}
+        manifest[stage_entry_key("transform")] = {"status": COMPLETE}
+        _write_text(spark, manifest_path, json.dumps(manifest, indent=2, sort_keys=True))
+        return
+
+    customers_blob = bronze_blob("superoperator", "customers")
+    payments_blob = bronze_blob("superoperator", "payments")
+
     # Bronze -> Silver
-    customers_bronze = read_bronze_jsonl(spark, prefix, "superoperator", "customers", run_date)
-    payments_bronze = read_bronze_jsonl(spark, prefix, "superoperator", "payments", run_date)
+    customers_bronze = load_bronze(
+        spark, prefix, spec, registry, "superoperator", "customers", run_date,
+        register=args.register_schemas, blob=customers_blob,
+    )
+    payments_bronze = load_bronze(
+        spark, prefix, spec, registry, "superoperator", "payments", run_date,
+        register=args.register_schemas, blob=payments_blob,
+    )
 
     customers_silver = clean_customers(customers_bronze)
     payments_silver = clean_payments(payments_bronze)
 
-    write_parquet(customers_silver, prefix, "silver", "core", "customers", run_date)
-    write_parquet(payments_silver, prefix, "silver", "finance", "payments", run_date)
+    # Unchanged endpoints add nothing to the cumulative tables, and their silver output for
+    # this run_date would be identical to the earlier run's.
+    merge_staging = []
+    if args.mode == "incremental":
+        if customers_blob is None:
+            with log_stage(log, "merge:customers"):
+                customers_silver = merge_cumulative(
+                    spark, customers_silver, prefix, "core", "customers", CUSTOMERS_KEY, run_date
+                )
+                merge_staging.append(merge_staging_path(prefix, "core", "customers", run_date))
+        if payments_blob is None:
+            with log_stage(log, "merge:payments"):
+                payments_silver = merge_cumulative(
+                    spark, payments_silver, prefix, "finance", "payments", PAYMENTS_KEY, run_date
+                )
+                merge_staging.append(merge_staging_path(prefix, "finance", "payments", run_date))
+
+    if customers_blob is None:
+        with log_stage(log, "silver:customers") as st:
+            customers_silver = write_silver(spark, customers_silver, prefix, "core", "customers", run_date, args.silver_cache)
+            if args.silver_cache != "none":
+                st["rows"] = customers_silver.count()
+    if payments_blob is None:
+        with log_stage(log, "silver:payments") as st:
+            payments_silver = write_silver(spark, payments_silver, prefix, "finance", "payments", run_date, args.silver_cache)
+            if args.silver_cache != "none":
+                st["rows"] = payments_silver.count()
 
     # Silver -> Gold (curated)
     gold_tables = gold_facts(customers_silver, payments_silver)
+    qc_spec = load_qc_spec(args.qc_config)
+    blocked = []
     for table_name, df in gold_tables.items():
+        if unchanged.get(table_name):
+            log.info("Gold %s skipped: same as run_date=%s", table_name, unchanged[table_name])
+            manifest[gold_entry_key(table_name)] = {"status": UNCHANGED, "same_as": unchanged[table_name]}
+            continue
         domain = "core" if table_name.startswith("dim_") else "finance"
-        write_parquet(df, prefix, "gold", domain, table_name, run_date)
+        with log_stage(log, f"qc:{table_name}"):
+            if not gold_qc_passed(table_name, df, qc_spec, gold_tables, run_date):
+                log.error("QC failed for %s; gold write skipped", table_name)
+                blocked.append(table_name)
+                continue
+        with log_stage(log, f"gold:{table_name}") as st:
+            out = write_parquet(df, prefix, "gold", domain, table_name, run_date)
+            gold_manifest = write_gold_manifest(spark, out, prefix, GOLD_KEYS.get(table_name))
+            st["rows"] = gold_manifest["rows"]
+            st["files"] = len(gold_manifest["files"])
+        manifest[gold_entry_key(table_name)] = {"status": CHANGED, "hash": gold_manifest["content_hash"]}
+
+    customers_silver.unpersist()
+    payments_silver.unpersist()
+    # Silver and gold no longer read the merge results
+    for path in merge_staging:
+        _delete_path(spark, path)
+
+    if blocked:
+        manifest.pop(stage_entry_key("transform"), None)
+    else:
+        manifest[stage_entry_key("transform")] = {"status": COMPLETE}
+    _write_text(spark, manifest_path, json.dumps(manifest, indent=2, sort_keys=True))
+
+    if blocked:
+        raise SystemExit(f"Gold QC failed for {', '.join(blocked)} (run_date={run_date})")
 
     log.info("Transform complete for run_date=%s", run_date)
 
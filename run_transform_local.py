@@ -0,0 +1,131 @@
+"""
+Transform without a Spark cluster when the day's data fits on one machine.
+
+  python pipelines/run_transform_local.py                  # auto: in-process below TRANSFORM_LOCAL_MAX_BYTES, else spark-submit
+  python pipelines/run_transform_local.py --engine local   # always in-process (src/transform_local.py)
+  python pipelines/run_transform_local.py --parity-check   # local output under _parity/local/ vs. Spark's gold
+
+Reads and writes the same lake paths and run manifest as run_transform.py, so extract and load
+do not care which engine ran. `--parity-check` expects Spark's gold for the run date to exist.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+
+from src.adls import ADLSClient, abfss_url
+from src.bronze import load_endpoints_spec
+from src.config import get_config
+from src.logging_utils import setup_logging
+from src.metrics import write_metrics
+from src.qc.checks import load_qc_spec
+from src.schema_registry import SchemaRegistry
+from src.state import COMPLETE, KeyedState, make_state_store, run_manifest_name, stage_entry_key
+from src.transform_local import bronze_bytes, gold_parity, pick_engine, run_local_transform
+
+log = setup_logging("transform")
+
+PARITY_ROOT = "_parity/local/"
+
+
+def _spark_submit(args: argparse.Namespace, cfg, run_date: str) -> None:
+    cmd = [
+        args.spark_submit,
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "run_transform.py"),
+        "--run-date", run_date,
+        "--abfss-prefix", abfss_url(cfg.adls_account_url, cfg.adls_container),
+        "--mode", args.mode,
+    ]
+    for flag, value in (
+        ("--endpoints-config", args.endpoints_config),
+        ("--schemas-dir", args.schemas_dir),
+        ("--qc-config", args.qc_config),
+    ):
+        if value:
+            cmd += [flag, value]
+    if cfg.state_dir:
+        cmd += ["--run-manifest", os.path.join(os.path.abspath(cfg.state_dir), run_manifest_name(run_date))]
+    log.info("Running: %s", " ".join(cmd))
+    subprocess.check_call(cmd)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--run-date", default=None, help="YYYY-MM-DD (default: RUN_DATE or today)")
+    parser.add_argument(
+        "--engine", choices=("auto", "local", "spark"), default="auto",
+        help="auto: local when the run's bronze is at most TRANSFORM_LOCAL_MAX_BYTES (snapshot mode only)",
+    )
+    parser.add_argument("--mode", choices=("snapshot", "incremental"), default="snapshot")
+    parser.add_argument("--endpoints-config", default=None, help="Path to endpoints.yml (default: configs/endpoints.yml)")
+    parser.add_argument("--schemas-dir", default=None, help="Schema registry root (default: configs/schemas)")
+    parser.add_argument("--qc-config", default=None, help="Gold QC rules (default: configs/qc.yml)")
+    parser.add_argument("--spark-submit", default=os.environ.get("SPARK_SUBMIT", "spark-submit"))
+    parser.add_argument(
+        "--parity-check", action="store_true",
+        help=f"Write local output under {PARITY_ROOT} and compare its gold with Spark's; exit 1 on differences",
+    )
+    args = parser.parse_args()
+
+    cfg = get_config()
+    run_date = args.run_date or cfg.run_date
+    try:
+        run_transform_local(args, cfg, run_date)
+    finally:
+        write_metrics("transform", run_date)
+
+
+def run_transform_local(args: argparse.Namespace, cfg, run_date: str) -> None:
+    adls = ADLSClient(cfg.adls_account_url)
+    spec = load_endpoints_spec(args.endpoints_config)
+    manifest_store = make_state_store(cfg, adls, run_manifest_name(run_date))
+    run_manifest = manifest_store.read()
+
+    engine = "local" if args.parity_check else args.engine
+    if engine == "auto":
+        size = bronze_bytes(adls, cfg.adls_container, spec, run_date, run_manifest)
+        engine = pick_engine(size, cfg.transform_local_max_bytes, args.mode)
+        if size is None:
+            log.warning("Bronze for run_date=%s is incomplete; using the %s engine", run_date, engine)
+        else:
+            log.info("Bronze for run_date=%s is ~%s bytes uncompressed; using the %s engine", run_date, size, engine)
+    if engine == "spark":
+        _spark_submit(args, cfg, run_date)
+        return
+    if args.mode != "snapshot":
+        raise SystemExit("The local engine only supports --mode snapshot")
+
+    if args.parity_check:
+        # Every table is rebuilt for the comparison, whatever the run manifest says
+        run_local_transform(
+            adls, cfg.adls_container, run_date, spec, SchemaRegistry(args.schemas_dir), load_qc_spec(args.qc_config),
+            run_manifest=run_manifest, output_root=PARITY_ROOT, skip_unchanged=False,
+        )
+        report = gold_parity(adls, cfg.adls_container, run_date, "", PARITY_ROOT)
+        log.info("Gold parity spark vs. local for run_date=%s\n%s", run_date, json.dumps(report, indent=2))
+        if not all(r["equal"] for r in report.values()):
+            raise SystemExit(1)
+        return
+
+    entries, blocked = run_local_transform(
+        adls, cfg.adls_container, run_date, spec, SchemaRegistry(args.schemas_dir), load_qc_spec(args.qc_config),
+        run_manifest=run_manifest,
+    )
+    state = KeyedState(manifest_store)
+    for key, entry in entries.items():
+        state.put(key, entry)
+    if blocked:
+        state.delete(stage_entry_key("transform"))
+    else:
+        state.put(stage_entry_key("transform"), {"status": COMPLETE})
+
+    if blocked:
+        raise SystemExit(f"Gold QC failed for {', '.join(blocked)} (run_date={run_date})")
+
+    log.info("Transform complete for run_date=%s", run_date)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from src.metrics import get_metrics
+
+
+@dataclass
+class Task:
+    """
+    A unit of pipeline work (e.g. one endpoint extract or one table load).
+
+    `group` is used for concurrency limits, typically the source name. `depends_on` lists task
+    names that must finish successfully before this one starts.
+    """
+    name: str
+    group: str
+    fn: Callable[[], Any]
+    depends_on: List[str] = field(default_factory=list)
+
+
+@dataclass
+class TaskResult:
+    name: str
+    group: str
+    status: str  # "ok" | "failed" | "skipped"
+    seconds: float
+    result: Any = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status == "ok"
+
+
+def _run_one(task: Task) -> TaskResult:
+    start = time.perf_counter()
+    try:
+        result = task.fn()
+        res = TaskResult(task.name, task.group, "ok", time.perf_counter() - start, result=result)
+    except Exception as e:  # one failing task must not abort the others
+        res = TaskResult(
+            task.name,
+            task.group,
+            "failed",
+            time.perf_counter() - start,
+            error=f"{type(e).__name__}: {e}\n{traceback.format_exc()}",
+        )
+    get_metrics().record_span("task", res.seconds, res.status, group=task.group, task=task.name)
+    return res
+
+
+def _check_dependencies(tasks: List[Task]) -> None:
+    names = {t.name for t in tasks}
+    if len(names) != len(tasks):
+        raise ValueError("Task names must be unique")
+    for t in tasks:
+        unknown = set(t.depends_on) - names
+        if unknown:
+            raise ValueError(f"Task {t.name} depends on unknown task(s) {sorted(unknown)}")
+    # Kahn's algorithm: anything left over is part of a cycle
+    remaining = {t.name: set(t.depends_on) for t in tasks}
+    while True:
+        ready = [n for n, deps in remaining.items() if not deps]
+        if not ready:
+            break
+        for n in ready:
+            del remaining[n]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+    if remaining:
+        raise ValueError(f"Dependency cycle between tasks {sorted(remaining)}")
+
+
+def run_tasks(tasks: List[Task], limits: Optional[Dict[str, int]] = None, default_limit: int = 1) -> List[TaskResult]:
+    """
+    Run tasks concurrently with a separate worker pool per group.
+
+    All groups run at the same time; `limits[group]` caps how many tasks of that group are
+    in flight. A task is submitted once all of its `depends_on` tasks succeeded; if one of them
+    failed or was skipped, it is reported as "skipped" without running. Exceptions are captured
+    in the returned TaskResult instead of being raised. Results are returned in the same order
+    as `tasks`.
+    """
+    _check_dependencies(tasks)
+    limits = limits or {}
+    groups = sorted({t.group for t in tasks})
+    pools = {
+        g: ThreadPoolExecutor(max_workers=max(1, int(limits.get(g, default_limit))), thread_name_prefix=f"task-{g}")
+        for g in groups
+    }
+    results: Dict[str, TaskResult] = {}
+    waiting = list(tasks)
+    running = {}
+    try:
+        while waiting or running:
+            for t in list(waiting):
+                deps = [results.get(d) for d in t.depends_on]
+                if any(r is not None and not r.ok for r in deps):
+                    results[t.name] = TaskResult(
+                        t.name, t.group, "skipped", 0.0,
+                        error=f"dependency failed: {[r.name for r in deps if r is not None and not r.ok]}",
+                    )
+                    waiting.remove(t)
+                elif all(r is not None for r in deps):
+                    running[pools[t.group].submit(_run_one, t)] = t
+                    waiting.remove(t)
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                results[running.pop(fut).name] = fut.result()
+        return [results[t.name] for t in tasks]
+    finally:
+        for pool in pools.values():
+            pool.shutdown(wait=True)
+
+
+def format_summary(results: List[TaskResult]) -> str:
+    lines = []
+    for r in sorted(results, key=lambda r: r.seconds, reverse=True):
+        extra = f" result={r.result}" if r.ok and r.result is not None else ""
+        err = f" error={r.error.splitlines()[0]}" if r.error else ""
+        lines.append(f"{r.group}/{r.name}: {r.status} {r.seconds:.2f}s{extra}{err}")
+    failed = sum(1 for r in results if r.status == "failed")
+    skipped = sum(1 for r in results if r.status == "skipped")
+    lines.append(f"total={len(results)} failed={failed} skipped={skipped}")
+    return "\n".join(lines)
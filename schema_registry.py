@@ -0,0 +1,95 @@
+"""
+Versioned bronze schemas, one directory per source/endpoint:
+
+  configs/schemas/{source}/{endpoint}/v1.json
+  configs/schemas/{source}/{endpoint}/v2.json   <- latest wins
+
+Each file is a Spark StructType in its JSON form (`StructType.jsonValue()`), so it can be
+reviewed and diffed like any other config. New versions are generated from a sample of
+bronze data (`infer_schema_from_sample`) and only written when the schema actually changed.
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+from typing import TYPE_CHECKING, List, Optional
+
+if TYPE_CHECKING:  # pyspark is only needed by the Spark transform; the local engine reads get_json()
+    from pyspark.sql import SparkSession
+    from pyspark.sql.types import StructType
+
+
+_VERSION_RE = re.compile(r"^v(\d+)\.json$")
+
+
+class SchemaRegistry:
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or os.path.join(os.path.dirname(__file__), "..", "configs", "schemas")
+
+    def _dir(self, source: str, endpoint: str) -> str:
+        return os.path.join(self.root, source, endpoint)
+
+    def versions(self, source: str, endpoint: str) -> List[int]:
+        d = self._dir(source, endpoint)
+        if not os.path.isdir(d):
+            return []
+        return sorted(int(m.group(1)) for m in (_VERSION_RE.match(f) for f in os.listdir(d)) if m)
+
+    def get_json(self, source: str, endpoint: str, version: Optional[int] = None) -> Optional[dict]:
+        """Registered schema in its JSON form (latest version by default)."""
+        versions = self.versions(source, endpoint)
+        if not versions:
+            return None
+        v = version if version is not None else versions[-1]
+        with open(os.path.join(self._dir(source, endpoint), f"v{v}.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def get(self, source: str, endpoint: str, version: Optional[int] = None) -> Optional[StructType]:
+        from pyspark.sql.types import StructType
+
+        doc = self.get_json(source, endpoint, version)
+        return StructType.fromJson(doc) if doc is not None else None
+
+    def register(self, source: str, endpoint: str, schema: StructType) -> int:
+        """
+        Store `schema` as the next version unless it equals the latest one. Returns the version in effect.
+        """
+        versions = self.versions(source, endpoint)
+        if versions and self.get(source, endpoint) == schema:
+            return versions[-1]
+        v = (versions[-1] + 1) if versions else 1
+        d = self._dir(source, endpoint)
+        os.makedirs(d, exist_ok=True)
+        with open(os.path.join(d, f"v{v}.json"), "w", encoding="utf-8") as f:
+            json.dump(schema.jsonValue(), f, indent=2, sort_keys=True)
+        return v
+
+
+def infer_schema_from_sample(spark: SparkSession, path: str, fmt: str = "jsonl", sample_rows: int = 10_000) -> StructType:
+    """
+    Infer a schema from the first `sample_rows` lines only (not the whole file).
+    """
+    if fmt == "parquet":
+        return spark.read.parquet(path).schema
+    lines = spark.read.text(path).limit(sample_rows)
+    return spark.read.json(lines.rdd.map(lambda r: r.value)).schema
+
+
+def schema_drift(expected: StructType, observed: StructType) -> List[str]:
+    """
+    Top-level differences between the registered schema and what the data looks like.
+    """
+    exp = {f.name: f.dataType for f in expected.fields}
+    obs = {f.name: f.dataType for f in observed.fields}
+    issues = []
+    for name in sorted(obs.keys() - exp.keys()):
+        issues.append(f"unregistered_field={name} type={obs[name].simpleString()}")
+    for name in sorted(exp.keys() - obs.keys()):
+        issues.append(f"missing_field={name}")
+    for name in sorted(exp.keys() & obs.keys()):
+        if exp[name] != obs[name]:
+            issues.append(
+                f"type_mismatch={name} registered={exp[name].simpleString()} observed={obs[name].simpleString()}"
+            )
+    return issues
@@ -1,11 +1,82 @@
 from __future__ import annotations
 
+import json
 import os
-from typing import Optional
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional, Tuple
 
 from azure.identity import DefaultAzureCredential
 from azure.keyvault.secrets import SecretClient
 
+# Cached Key Vault values are re-fetched after this long (rotation pickup vs. vault traffic).
+DEFAULT_SECRET_TTL_SECONDS = 3600
+PREFETCH_WORKERS = 8
+
+_credential: Optional[DefaultAzureCredential] = None
+_credential_lock = threading.Lock()
+
+
+def get_credential() -> DefaultAzureCredential:
+    """
+    Process-wide `DefaultAzureCredential`. Sharing it means one credential-chain probe and one
+    token cache per process, instead of one per client (ADLS, Key Vault, ...).
+    """
+    global _credential
+    with _credential_lock:
+        if _credential is None:
+            _credential = DefaultAzureCredential(exclude_interactive_browser_credential=False)
+        return _credential
+
+
+class EncryptedDiskCache:
+    """
+    Secret values persisted across short-lived processes in one Fernet-encrypted JSON file.
+
+    Needs the optional `cryptography` package and a key from `Fernet.generate_key()`; the key
+    must come from somewhere other than the cache file (e.g. the job's environment). Entries
+    keep their absolute expiry, so the TTL holds across processes. Unreadable or undecryptable
+    files are treated as empty.
+    """
+
+    def __init__(self, path: str, key: str | bytes):
+        try:
+            from cryptography.fernet import Fernet
+        except ImportError as e:  # optional dependency
+            raise RuntimeError("EncryptedDiskCache requires the 'cryptography' package") from e
+        self.path = path
+        self._fernet = Fernet(key.encode() if isinstance(key, str) else key)
+        self._lock = threading.Lock()
+
+    def load(self) -> Dict[str, Tuple[str, float]]:
+        from cryptography.fernet import InvalidToken
+
+        try:
+            with open(self.path, "rb") as f:
+                doc = json.loads(self._fernet.decrypt(f.read()))
+        except (OSError, ValueError, InvalidToken):
+            return {}
+        now = time.time()
+        return {k: (v["value"], v["expires_at"]) for k, v in doc.items() if v["expires_at"] > now}
+
+    def store(self, entries: Dict[str, Tuple[str, float]]) -> None:
+        doc = {k: {"value": v, "expires_at": exp} for k, (v, exp) in entries.items()}
+        token = self._fernet.encrypt(json.dumps(doc).encode("utf-8"))
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            fd, tmp = tempfile.mkstemp(dir=directory, prefix=".secrets-")
+            try:
+                os.chmod(tmp, 0o600)
+                with os.fdopen(fd, "wb") as f:
+                    f.write(token)
+                os.replace(tmp, self.path)
+            except BaseException:
+                os.remove(tmp)
+                raise
+
 
 class SecretProvider:
     """
@@ -14,15 +85,41 @@ class SecretProvider:
     Recommended pattern:
     - Store API keys, DB credentials, and OAuth secrets in Key Vault.
     - Use DefaultAzureCredential (managed identity in Azure, or service principal locally).
+
+    Key Vault values are cached in memory for `ttl_seconds` (and in `disk_cache` when given),
+    so repeated lookups from many endpoint workers cost one vault round trip per secret.
+    Concurrent first lookups of the same secret wait for a single fetch.
     """
 
-    def __init__(self, keyvault_url: Optional[str]):
+    def __init__(
+        self,
+        keyvault_url: Optional[str],
+        ttl_seconds: float = DEFAULT_SECRET_TTL_SECONDS,
+        disk_cache: Optional[EncryptedDiskCache] = None,
+    ):
         self.keyvault_url = keyvault_url
+        self.ttl_seconds = ttl_seconds
         self._client = None
+        self._disk_cache = disk_cache
+        self._lock = threading.Lock()
+        self._fetch_locks: Dict[str, threading.Lock] = {}
+        # name -> (value, expires_at as wall-clock time, comparable with the disk cache)
+        self._cache: Dict[str, Tuple[str, float]] = disk_cache.load() if disk_cache else {}
 
         if keyvault_url:
-            credential = DefaultAzureCredential(exclude_interactive_browser_credential=False)
-            self._client = SecretClient(vault_url=keyvault_url, credential=credential)
+            self._client = SecretClient(vault_url=keyvault_url, credential=get_credential())
+
+    def _cached(self, secret_name: str) -> Optional[str]:
+        with self._lock:
+            hit = self._cache.get(secret_name)
+            if hit and hit[1] > time.time():
+                return hit[0]
+            self._cache.pop(secret_name, None)
+            return None
+
+    def _fetch_lock(self, secret_name: str) -> threading.Lock:
+        with self._lock:
+            return self._fetch_locks.setdefault(secret_name, threading.Lock())
 
     def get_secret(self, secret_name: str, env_fallback: Optional[str] = None) -> str:
         if not secret_name:
@@ -30,8 +127,19 @@ class SecretProvider:
 
         # Try Key Vault
         if self._client:
-            secret = self._client.get_secret(secret_name)
-            return secret.value
+            value = self._cached(secret_name)
+            if value is not None:
+                return value
+            with self._fetch_lock(secret_name):
+                value = self._cached(secret_name)  # fetched by another thread while we waited
+                if value is None:
+                    value = self._client.get_secret(secret_name).value
+                    with self._lock:
+                        self._cache[secret_name] = (value, time.time() + self.ttl_seconds)
+                        snapshot = dict(self._cache)
+                    if self._disk_cache:
+                        self._disk_cache.store(snapshot)
+            return value
 
         # Fallback to env
         if env_fallback and os.getenv(env_fallback):
@@ -41,3 +149,43 @@ class SecretProvider:
             f"Key Vault not configured and env fallback missing for secret '{secret_name}'. "
             f"Set AZURE_KEYVAULT_URL or provide {env_fallback}."
         )
+
+    def prefetch(self, secret_names: Iterable[str], max_workers: int = PREFETCH_WORKERS) -> None:
+        """
+        Warm the cache for `secret_names` with parallel vault requests (no-op without Key Vault).
+        """
+        names = sorted({n for n in secret_names if n})
+        if not self._client or not names:
+            return
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(names)), thread_name_prefix="secrets") as pool:
+            list(pool.map(self.get_secret, names))
+
+    def set_secret(self, secret_name: str, value: str) -> None:
+        """Write a new version of a Key Vault secret (e.g. a rotated OAuth token) and cache it."""
+        if not self._client:
+            raise RuntimeError(f"Key Vault not configured; cannot store secret '{secret_name}'")
+        self._client.set_secret(secret_name, value)
+        with self._lock:
+            self._cache[secret_name] = (value, time.time() + self.ttl_seconds)
+            snapshot = dict(self._cache)
+        if self._disk_cache:
+            self._disk_cache.store(snapshot)
+
+    def invalidate(self, secret_name: str) -> None:
+        """Drop a cached value, e.g. after the secret was rotated."""
+        with self._lock:
+            self._cache.pop(secret_name, None)
+
+
+def make_secret_provider(cfg) -> SecretProvider:
+    """
+    SecretProvider for a pipeline run. `SECRET_CACHE_PATH` + `SECRET_CACHE_KEY` enable the
+    encrypted on-disk cache, so back-to-back jobs on one host share fetched secrets.
+    """
+    disk_cache = None
+    if cfg.secret_cache_path:
+        key = os.environ.get("SECRET_CACHE_KEY")
+        if not key:
+            raise RuntimeError("SECRET_CACHE_PATH is set but SECRET_CACHE_KEY is missing")
+        disk_cache = EncryptedDiskCache(cfg.secret_cache_path, key)
+    return SecretProvider(cfg.keyvault_url, ttl_seconds=cfg.secret_ttl_seconds, disk_cache=disk_cache)
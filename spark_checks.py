@@ -0,0 +1,146 @@
+"""
+Spark implementation of the declarative QC checks in `src.qc.checks`.
+
+All metrics of a table are computed by a single `agg` (one Spark job); nothing is collected to
+the driver except that one row. Referential-integrity checks left-join the distinct reference
+keys (broadcast) into the same plan before the aggregation.
+"""
+from __future__ import annotations
+
+import datetime as dt
+from typing import Dict, List, Optional
+
+from pyspark.sql import DataFrame
+from pyspark.sql import functions as F
+
+from src.qc.checks import (
+    Freshness,
+    MinRows,
+    NullRate,
+    QCResult,
+    ReferentialIntegrity,
+    RegexMatch,
+    UniqueKey,
+    ValueRange,
+)
+
+
+def _rate(n: int, total: int) -> float:
+    return n / total if total else 0.0
+
+
+def _count_if(cond) -> F.Column:
+    return F.sum(F.when(cond, 1).otherwise(0))
+
+
+def run_suite_spark(
+    df: DataFrame,
+    specs: List,
+    refs: Optional[Dict[str, DataFrame]] = None,
+    now: Optional[dt.datetime] = None,
+) -> List[QCResult]:
+    """
+    Evaluate `specs` on a Spark DataFrame; results are named and worded like `run_suite`.
+    """
+    refs = refs or {}
+    now = now or dt.datetime.now(dt.timezone.utc)
+    columns = set(df.columns)
+    plan = df
+    aggs = [F.count(F.lit(1)).alias("_rows")]
+    skipped: Dict[int, QCResult] = {}
+
+    for i, s in enumerate(specs):
+        cols = list(s.columns) if isinstance(s, UniqueKey) else ([s.column] if hasattr(s, "column") else [])
+        label = f"{s.name}:{','.join(cols)}" if cols else s.name
+        missing = [c for c in cols if c not in columns]
+        if missing:
+            skipped[i] = QCResult(label, False, f"missing_column={','.join(missing)}")
+            continue
+
+        if isinstance(s, MinRows):
+            continue
+        if isinstance(s, UniqueKey):
+            aggs.append(F.countDistinct(*[F.col(c) for c in s.columns]).alias(f"m{i}_distinct"))
+            # countDistinct ignores rows with a null key part; count them so they are not reported as duplicates
+            any_null = F.lit(False)
+            for c in s.columns:
+                any_null = any_null | F.col(c).isNull()
+            aggs.append(_count_if(any_null).alias(f"m{i}_nullkeys"))
+            continue
+
+        c = F.col(s.column)
+        aggs.append(_count_if(c.isNull()).alias(f"m{i}_nulls"))
+        if isinstance(s, ValueRange):
+            x = c.cast("double")
+            # Non-null values that do not cast to a number are violations
+            bad = x.isNull()
+            if s.min_value is not None:
+                bad = bad | (x < s.min_value)
+            if s.max_value is not None:
+                bad = bad | (x > s.max_value)
+            aggs.append(_count_if(c.isNotNull() & bad).alias(f"m{i}_bad"))
+        elif isinstance(s, RegexMatch):
+            aggs.append(_count_if(c.isNotNull() & ~c.cast("string").rlike(f"^(?:{s.pattern})$")).alias(f"m{i}_bad"))
+        elif isinstance(s, Freshness):
+            aggs.append(F.max(F.to_timestamp(c)).alias(f"m{i}_latest"))
+        elif isinstance(s, ReferentialIntegrity):
+            if s.ref not in refs:
+                skipped[i] = QCResult(label, False, f"missing_ref_table={s.ref}")
+                aggs.pop()
+                continue
+            key, hit = f"_m{i}_refkey", f"_m{i}_hit"
+            ref_keys = refs[s.ref].select(F.col(s.ref_column).alias(key)).distinct().withColumn(hit, F.lit(1))
+            plan = plan.join(F.broadcast(ref_keys), plan[s.column] == ref_keys[key], "left")
+            aggs.append(_count_if(c.isNotNull() & F.col(hit).isNull()).alias(f"m{i}_bad"))
+
+    row = plan.agg(*aggs).collect()[0].asDict()
+    total = row["_rows"]
+
+    results: List[QCResult] = []
+    for i, s in enumerate(specs):
+        if i in skipped:
+            results.append(skipped[i])
+            continue
+        if isinstance(s, MinRows):
+            results.append(QCResult(s.name, total >= s.min_rows, f"rows={total} min_rows={s.min_rows}"))
+        elif isinstance(s, UniqueKey):
+            dupes = total - row[f"m{i}_nullkeys"] - row[f"m{i}_distinct"]
+            results.append(QCResult(f"{s.name}:{','.join(s.columns)}", dupes == 0, f"duplicate_keys={dupes}"))
+        else:
+            label = f"{s.name}:{s.column}"
+            nulls = row[f"m{i}_nulls"]
+            if isinstance(s, NullRate):
+                rate = _rate(nulls, total)
+                results.append(QCResult(label, rate <= s.max_null_rate, f"null_rate={rate:.4f} max_null_rate={s.max_null_rate}"))
+            elif isinstance(s, ValueRange):
+                rate = _rate(row[f"m{i}_bad"], total - nulls)
+                results.append(QCResult(
+                    label, rate <= s.max_violation_rate,
+                    f"out_of_range_rate={rate:.4f} min={s.min_value} max={s.max_value}",
+                ))
+            elif isinstance(s, RegexMatch):
+                rate = _rate(row[f"m{i}_bad"], total - nulls)
+                results.append(QCResult(label, rate <= s.max_violation_rate, f"mismatch_rate={rate:.4f} pattern={s.pattern}"))
+            elif isinstance(s, ReferentialIntegrity):
+                orphans = row[f"m{i}_bad"]
+                rate = _rate(orphans, total - nulls)
+                results.append(QCResult(
+                    label, rate <= s.max_orphan_rate,
+                    f"orphans={orphans} orphan_rate={rate:.4f} ref={s.ref}.{s.ref_column}",
+                ))
+            elif isinstance(s, Freshness):
+                latest = row[f"m{i}_latest"]
+                if latest is None:
+                    results.append(QCResult(label, False, "latest=None"))
+                    continue
+                if latest.tzinfo is None:
+                    # Spark returns session-local naive datetimes; Databricks sessions run in UTC
+                    latest = latest.replace(tzinfo=dt.timezone.utc)
+                age_hours = (now - latest).total_seconds() / 3600
+                results.append(QCResult(
+                    label, age_hours <= s.max_age_hours,
+                    f"latest={latest.isoformat()} age_hours={age_hours:.1f} max_age_hours={s.max_age_hours}",
+                ))
+            else:
+                raise TypeError(f"Unsupported QC check spec: {s!r}")
+    return results
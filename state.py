@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import datetime as dt
+import json
+import os
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, Optional
+
+from azure.core.exceptions import ResourceNotFoundError
+
+from src.adls import ADLSClient
+
+
+class JsonStateStore(ABC):
+    """
+    A small JSON document persisted between runs (watermarks, checkpoints, hashes...).
+
+    Implementations must make `write` atomic: readers see either the old or the new document.
+    """
+
+    @abstractmethod
+    def read(self) -> Dict[str, Any]:
+        ...
+
+    @abstractmethod
+    def write(self, doc: Dict[str, Any]) -> None:
+        ...
+
+
+class LocalJsonStore(JsonStateStore):
+    """
+    Local-file stand-in, for local runs and tests. Writes go to a temp file that is renamed over
+    the target.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def read(self) -> Dict[str, Any]:
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def write(self, doc: Dict[str, Any]) -> None:
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".json")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(doc, f, indent=2, sort_keys=True)
+            os.replace(tmp, self.path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+
+class ADLSJsonStore(JsonStateStore):
+    """
+    State document stored as a single blob. A single-shot blob upload replaces the blob atomically.
+    """
+
+    def __init__(self, adls: ADLSClient, container: str, blob_path: str):
+        self.adls = adls
+        self.container = container
+        self.blob_path = blob_path
+
+    def read(self) -> Dict[str, Any]:
+        try:
+            return json.loads(self.adls.download_text(self.container, self.blob_path))
+        except ResourceNotFoundError:
+            return {}
+
+    def write(self, doc: Dict[str, Any]) -> None:
+        self.adls.upload_text(self.container, self.blob_path, json.dumps(doc, indent=2, sort_keys=True))
+
+
+def make_state_store(cfg, adls: ADLSClient, name: str) -> JsonStateStore:
+    """
+    `STATE_DIR` set -> local file `{STATE_DIR}/{name}`; otherwise blob `_state/{name}` in the lake container.
+    """
+    if cfg.state_dir:
+        return LocalJsonStore(os.path.join(cfg.state_dir, name))
+    return ADLSJsonStore(adls, cfg.adls_container, f"_state/{name}")
+
+
+class KeyedState:
+    """
+    Thread-safe get/put of one entry per key in a JSON state document.
+    """
+
+    def __init__(self, store: JsonStateStore):
+        self.store = store
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.store.read().get(key)
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        with self._lock:
+            doc = self.store.read()
+            doc[key] = value
+            self.store.write(doc)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            doc = self.store.read()
+            if doc.pop(key, None) is not None:
+                self.store.write(doc)
+
+
+def parse_cursor(value: Any) -> Optional[dt.datetime]:
+    if value is None or value == "":
+        return None
+    if isinstance(value, dt.datetime):
+        ts = value
+    else:
+        try:
+            ts = dt.datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=dt.timezone.utc)
+    return ts
+
+
+class WatermarkStore:
+    """
+    Max cursor value (e.g. `updated_at`) seen per endpoint, keyed as "{source}/{endpoint}".
+
+    Each entry also keeps the run_date that advanced it and the `since` that run started from,
+    so re-running that run_date extracts the same window instead of the few minutes after its
+    own watermark. Updates are read-modify-write of one document under a lock, so endpoint
+    workers in the same process can advance their own watermark concurrently. Watermarks only
+    move forward, and never on behalf of an earlier run_date.
+    """
+
+    def __init__(self, store: JsonStateStore):
+        self.store = store
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[dt.datetime]:
+        entry = self.store.read().get(key)
+        return parse_cursor(entry["cursor"]) if entry else None
+
+    def since(self, key: str, run_date: str) -> Optional[dt.datetime]:
+        """Lower bound for `run_date`'s window; None means the endpoint's default lookback."""
+        entry = self.store.read().get(key)
+        if not entry:
+            return None
+        advanced_by = entry.get("run_date") or ""
+        if advanced_by == run_date:
+            return parse_cursor(entry.get("since"))
+        if advanced_by < run_date:
+            return parse_cursor(entry["cursor"])
+        # Backfilling a run_date older than the watermark: use the endpoint's default lookback.
+        return None
+
+    def advance(self, key: str, cursor: dt.datetime, run_date: str, since: Optional[dt.datetime] = None) -> None:
+        with self._lock:
+            doc = self.store.read()
+            entry = doc.get(key, {})
+            advanced_by = entry.get("run_date") or ""
+            if advanced_by > run_date:
+                return
+            current = parse_cursor(entry.get("cursor"))
+            if current is not None and current >= cursor and advanced_by == run_date:
+                return
+            if advanced_by == run_date:
+                # A rerun keeps the window its run_date started from.
+                since = parse_cursor(entry.get("since"))
+            if current is not None:
+                cursor = max(cursor, current)
+            doc[key] = {
+                "cursor": cursor.isoformat(),
+                "since": since.isoformat() if since is not None else None,
+                "run_date": run_date,
+                "updated_at": dt.datetime.now(dt.timezone.utc).isoformat(),
+            }
+            self.store.write(doc)
+
+
+class CursorTracker:
+    """
+    Pass-through iterator wrapper that records the max value of `field` over the records it yields.
+    """
+
+    def __init__(self, field: str):
+        self.field = field
+        self.max: Optional[dt.datetime] = None
+
+    def track(self, records: Iterable[dict]) -> Iterable[dict]:
+        for r in records:
+            ts = parse_cursor(r.get(self.field))
+            if ts is not None and (self.max is None or ts > self.max):
+                self.max = ts
+            yield r
+
+
+# Run manifest: one state document per run_date, e.g. `_state/runs/run_date=2026-02-01.json`.
+# Extract records every endpoint under `extract/{source}/{endpoint}`, transform every gold table
+# under `gold/{table}`, each with a status; unchanged entries name the earlier run_date holding
+# the same data (`same_as`). Transform and load record `stage/{stage}` once they finished.
+CHANGED = "changed"
+UNCHANGED = "unchanged"
+COMPLETE = "complete"
+
+
+def run_manifest_name(run_date: str) -> str:
+    return f"runs/run_date={run_date}.json"
+
+
+def extract_entry_key(source: str, endpoint: str) -> str:
+    return f"extract/{source}/{endpoint}"
+
+
+def gold_entry_key(table: str) -> str:
+    return f"gold/{table}"
+
+
+def is_unchanged(manifest: Optional[Dict[str, Any]], key: str) -> bool:
+    return bool(manifest) and (manifest.get(key) or {}).get("status") == UNCHANGED
+
+
+def stage_entry_key(stage: str) -> str:
+    return f"stage/{stage}"
+
+
+def run_finished(manifest: Optional[Dict[str, Any]]) -> bool:
+    """True once both transform and load completed for the manifest's run_date."""
+    return bool(manifest) and all(
+        (manifest.get(stage_entry_key(stage)) or {}).get("status") == COMPLETE for stage in ("transform", "load")
+    )
+
+
+def unchanged_since(manifest: Optional[Dict[str, Any]], keys: Iterable[str]) -> Optional[str]:
+    """
+    The earlier run_date whose data all `keys` equal, or None if any of them changed (or they
+    point at different run_dates).
+    """
+    dates = set()
+    for key in keys:
+        if not is_unchanged(manifest, key):
+            return None
+        dates.add(manifest[key].get("same_as"))
+    return dates.pop() if len(dates) == 1 and None not in dates else None
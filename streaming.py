@@ -0,0 +1,275 @@
+"""
+Streaming QC: the same check specs as `run_suite`, evaluated incrementally while data flows.
+
+`StreamingQC.observe_records` wraps the extract record stream and `observe_batches` wraps the
+load's Arrow batch stream. Both are pass-through generators, so the statistics are collected
+on the way to bronze / SQL without another pass over the data or a materialized table.
+
+`unique` checks keep a 64-bit hash per row and count duplicates exactly at the end (8 bytes
+per row). Specs that set `approx_max_duplicate_rate` use a fixed-size HyperLogLog sketch
+instead (~0.8% standard error at the default precision) and pass while the estimated
+duplicate rate stays within that margin.
+"""
+from __future__ import annotations
+
+import datetime as dt
+import hashlib
+import json
+import math
+import re
+from array import array
+from typing import Dict, Iterable, List, Optional
+
+from src.qc.checks import (
+    Freshness,
+    MinRows,
+    NullRate,
+    QCResult,
+    RegexMatch,
+    UniqueKey,
+    ValueRange,
+    spec_columns,
+)
+
+
+def _key_hash(values) -> int:
+    payload = json.dumps(values, default=str, separators=(",", ":")).encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(payload, digest_size=8).digest(), "big")
+
+
+class HyperLogLog:
+    def __init__(self, p: int = 14):
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(self.m)
+
+    def _add_hash(self, h: int) -> None:
+        idx = h >> (64 - self.p)
+        rest = h & ((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - rest.bit_length() + 1
+        if rank > self.registers[idx]:
+            self.registers[idx] = rank
+
+    def add(self, value) -> None:
+        self._add_hash(_key_hash(value))
+
+    def add_hashes(self, hashes) -> None:
+        """
+        Vectorized update from a numpy uint64 array of already-hashed values.
+        """
+        import numpy as np
+
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        shift = np.uint64(64 - self.p)
+        idx = (hashes >> shift).astype(np.int64)
+        rest = hashes & np.uint64((1 << (64 - self.p)) - 1)
+        bit_length = np.zeros(len(rest), dtype=np.int64)
+        nz = rest > 0
+        bit_length[nz] = np.floor(np.log2(rest[nz].astype(np.float64))).astype(np.int64) + 1
+        rank = (64 - self.p) - bit_length + 1
+        regs = np.frombuffer(self.registers, dtype=np.uint8).copy()
+        np.maximum.at(regs, idx, rank.astype(np.uint8))
+        self.registers = bytearray(regs.tobytes())
+
+    def estimate(self) -> float:
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        z = sum(2.0 ** -r for r in self.registers)
+        e = alpha * self.m * self.m / z
+        zeros = self.registers.count(0)
+        if e <= 2.5 * self.m and zeros:
+            return self.m * math.log(self.m / zeros)
+        return e
+
+
+class _Stats:
+    """
+    Per-column running statistics.
+    """
+
+    def __init__(self):
+        self.nulls = 0
+        self.min = None
+        self.max = None
+        self.violations = 0
+
+    def update_min_max(self, lo, hi) -> None:
+        if lo is not None and (self.min is None or lo < self.min):
+            self.min = lo
+        if hi is not None and (self.max is None or hi > self.max):
+            self.max = hi
+
+
+def _ts(value) -> Optional[dt.datetime]:
+    if value is None:
+        return None
+    if isinstance(value, dt.datetime):
+        ts = value
+    else:
+        try:
+            ts = dt.datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    return ts if ts.tzinfo else ts.replace(tzinfo=dt.timezone.utc)
+
+
+class StreamingQC:
+    def __init__(self, specs: List):
+        for s in specs:
+            if not isinstance(s, (MinRows, NullRate, UniqueKey, ValueRange, RegexMatch, Freshness)):
+                # e.g. ReferentialIntegrity needs the whole reference table; use run_suite on gold instead
+                raise ValueError(f"{type(s).__name__} ({s.name}) cannot be evaluated on a stream")
+        self.specs = specs
+        self.rows = 0
+        self._stats: Dict[int, _Stats] = {i: _Stats() for i in range(len(specs))}
+        self._hll: Dict[int, HyperLogLog] = {
+            i: HyperLogLog() for i, s in enumerate(specs)
+            if isinstance(s, UniqueKey) and s.approx_max_duplicate_rate is not None
+        }
+        self._key_hashes: Dict[int, array] = {
+            i: array("Q") for i, s in enumerate(specs)
+            if isinstance(s, UniqueKey) and s.approx_max_duplicate_rate is None
+        }
+        self._regex = {i: re.compile(s.pattern) for i, s in enumerate(specs) if isinstance(s, RegexMatch)}
+        # Spec index -> columns absent from some Arrow batch; such checks fail like in run_suite
+        self._missing: Dict[int, set] = {}
+
+    # -- record dicts (extract) -------------------------------------------------
+
+    def _observe_record(self, r: dict) -> None:
+        self.rows += 1
+        for i, s in enumerate(self.specs):
+            st = self._stats[i]
+            if isinstance(s, MinRows):
+                continue
+            if isinstance(s, UniqueKey):
+                h = _key_hash([r.get(c) for c in s.columns])
+                if i in self._hll:
+                    self._hll[i]._add_hash(h)
+                else:
+                    self._key_hashes[i].append(h)
+                continue
+            v = r.get(s.column)
+            if v is None:
+                st.nulls += 1
+                continue
+            if isinstance(s, ValueRange):
+                try:
+                    x = float(v)
+                except (TypeError, ValueError):
+                    st.violations += 1
+                    continue
+                st.update_min_max(x, x)
+                if (s.min_value is not None and x < s.min_value) or (s.max_value is not None and x > s.max_value):
+                    st.violations += 1
+            elif isinstance(s, RegexMatch):
+                if not self._regex[i].fullmatch(str(v)):
+                    st.violations += 1
+            elif isinstance(s, Freshness):
+                ts = _ts(v)
+                st.update_min_max(ts, ts)
+
+    def observe_records(self, records: Iterable[dict]) -> Iterable[dict]:
+        for r in records:
+            self._observe_record(r)
+            yield r
+
+    # -- Arrow batches (load) ---------------------------------------------------
+
+    def _observe_batch(self, batch) -> None:
+        import pyarrow.compute as pc
+
+        self.rows += batch.num_rows
+        names = batch.schema.names
+        for i, s in enumerate(self.specs):
+            st = self._stats[i]
+            if isinstance(s, MinRows):
+                continue
+            missing = [c for c in spec_columns(s) if c not in names]
+            if missing:
+                self._missing.setdefault(i, set()).update(missing)
+                continue
+            if isinstance(s, UniqueKey):
+                import pandas as pd
+
+                keys = batch.select(s.columns).to_pandas()
+                hashes = pd.util.hash_pandas_object(keys, index=False).to_numpy()
+                if i in self._hll:
+                    self._hll[i].add_hashes(hashes)
+                else:
+                    self._key_hashes[i].frombytes(hashes.astype("uint64").tobytes())
+                continue
+            arr = batch.column(s.column)
+            st.nulls += arr.null_count
+            if isinstance(s, ValueRange):
+                mm = pc.min_max(arr)
+                st.update_min_max(mm["min"].as_py(), mm["max"].as_py())
+                if s.min_value is not None:
+                    st.violations += pc.sum(pc.less(arr, s.min_value)).as_py() or 0
+                if s.max_value is not None:
+                    st.violations += pc.sum(pc.greater(arr, s.max_value)).as_py() or 0
+            elif isinstance(s, RegexMatch):
+                matched = pc.match_substring_regex(pc.cast(arr, "string"), f"^(?:{s.pattern})$")
+                st.violations += (len(arr) - arr.null_count) - (pc.sum(matched).as_py() or 0)
+            elif isinstance(s, Freshness):
+                mm = pc.min_max(arr)
+                st.update_min_max(_ts(mm["min"].as_py()), _ts(mm["max"].as_py()))
+
+    def observe_batches(self, batches: Iterable) -> Iterable:
+        for b in batches:
+            self._observe_batch(b)
+            yield b
+
+    # -- results ------------------------------------------------------------------
+
+    def _unique_result(self, i: int, s: UniqueKey) -> QCResult:
+        name = f"{s.name}:{','.join(s.columns)}"
+        if i in self._hll:
+            distinct = min(self.rows, round(self._hll[i].estimate()))
+            dupes = self.rows - distinct
+            tolerance = math.floor(self.rows * s.approx_max_duplicate_rate)
+            return QCResult(
+                name, dupes <= tolerance,
+                f"approx_duplicate_keys={dupes} approx_distinct={distinct} "
+                f"approx_max_duplicate_rate={s.approx_max_duplicate_rate}",
+            )
+        import numpy as np
+
+        hashes = np.frombuffer(self._key_hashes[i], dtype=np.uint64)
+        dupes = len(hashes) - len(np.unique(hashes))
+        return QCResult(name, dupes == 0, f"duplicate_keys={dupes} rows={len(hashes)}")
+
+    def results(self, now: Optional[dt.datetime] = None) -> List[QCResult]:
+        now = now or dt.datetime.now(dt.timezone.utc)
+        out: List[QCResult] = []
+        for i, s in enumerate(self.specs):
+            st = self._stats[i]
+            if i in self._missing:
+                label = f"{s.name}:{','.join(spec_columns(s))}"
+                out.append(QCResult(label, False, f"missing_column={','.join(sorted(self._missing[i]))}"))
+            elif isinstance(s, MinRows):
+                out.append(QCResult(s.name, self.rows >= s.min_rows, f"rows={self.rows} min_rows={s.min_rows}"))
+            elif isinstance(s, NullRate):
+                rate = st.nulls / self.rows if self.rows else 0.0
+                out.append(QCResult(
+                    f"{s.name}:{s.column}", rate <= s.max_null_rate, f"null_rate={rate:.4f} max_null_rate={s.max_null_rate}"
+                ))
+            elif isinstance(s, UniqueKey):
+                out.append(self._unique_result(i, s))
+            elif isinstance(s, (ValueRange, RegexMatch)):
+                non_null = self.rows - st.nulls
+                rate = st.violations / non_null if non_null else 0.0
+                detail = (
+                    f"out_of_range_rate={rate:.4f} min={st.min} max={st.max}"
+                    if isinstance(s, ValueRange) else f"mismatch_rate={rate:.4f} pattern={s.pattern}"
+                )
+                out.append(QCResult(f"{s.name}:{s.column}", rate <= s.max_violation_rate, detail))
+            elif isinstance(s, Freshness):
+                if st.max is None:
+                    out.append(QCResult(f"{s.name}:{s.column}", False, "latest=None"))
+                    continue
+                age_hours = (now - st.max).total_seconds() / 3600
+                out.append(QCResult(
+                    f"{s.name}:{s.column}", age_hours <= s.max_age_hours,
+                    f"latest={st.max.isoformat()} age_hours={age_hours:.1f} max_age_hours={s.max_age_hours}",
+                ))
+        return out
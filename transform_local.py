@@ -0,0 +1,469 @@
+"""
+In-process transform engine: DuckDB over Arrow, no JVM or cluster.
+
+Implements the bronze -> silver -> gold semantics of the Spark job in `run_transform.py`
+(`clean_customers`, `clean_payments`, `gold_facts`, blocking gold QC, `_manifest.json` and the
+run-manifest skips) for daily volumes that fit on one machine. Bronze blobs are downloaded to a
+temp directory, transformed by DuckDB, and the silver/gold parquet files are uploaded through the
+ADLS client, so it works with `ADLSClient` and `LocalADLSClient` alike.
+
+Not covered (use Spark): `--mode incremental` cumulative merges, schema registration and drift
+sampling. Gold content hashes use DuckDB's row hash, so after switching engines the loader
+re-reads a table's files once; `gold_parity` compares the actual rows of both engines.
+
+Needs the optional `duckdb` and `pyarrow` packages.
+"""
+from __future__ import annotations
+
+import hashlib
+import itertools
+import json
+import logging
+import os
+import shutil
+import tempfile
+from typing import Dict, List, Optional, Tuple
+
+from azure.core.exceptions import ResourceNotFoundError
+
+from src.adls import ADLSClient
+from src.bronze import bronze_blob_path, bronze_format
+from src.logging_utils import log_stage
+from src.qc.alerts import notify_qc_results
+from src.qc.checks import ReferentialIntegrity, checks_from_config, run_suite, spec_columns
+from src.schema_registry import SchemaRegistry
+from src.state import CHANGED, UNCHANGED, extract_entry_key, gold_entry_key, is_unchanged, unchanged_since
+from src.transform_spec import (
+    CHANGE_ORDER_COLS,
+    CUSTOMERS_KEY,
+    GOLD_INPUTS,
+    GOLD_KEYS,
+    MANIFEST_NAME,
+    PAYMENTS_KEY,
+    VOLATILE_COLS,
+)
+
+log = logging.getLogger(__name__)
+
+# Every silver/gold table is written as one file
+PART_NAME = "part-00000.parquet"
+# Bronze format -> typical uncompressed/stored size ratio, used to size a run before downloading it
+BRONZE_EXPANSION = {"jsonl.gz": 8, "jsonl.zst": 8, "parquet": 4, "jsonl": 1}
+
+# Spark type names (schema registry JSON) -> DuckDB
+_SPARK_TYPES = {
+    "string": "VARCHAR",
+    "long": "BIGINT",
+    "integer": "INTEGER",
+    "short": "SMALLINT",
+    "byte": "TINYINT",
+    "double": "DOUBLE",
+    "float": "FLOAT",
+    "boolean": "BOOLEAN",
+    "timestamp": "TIMESTAMPTZ",
+    "date": "DATE",
+    "binary": "BLOB",
+}
+
+
+def pick_engine(bronze_bytes: Optional[int], max_local_bytes: int, mode: str = "snapshot") -> str:
+    """
+    Engine for a run: `local` when its bronze fits the in-process engine, otherwise `spark`
+    (also when the size is unknown).
+    """
+    if mode != "snapshot" or bronze_bytes is None:
+        return "spark"
+    return "local" if bronze_bytes <= max_local_bytes else "spark"
+
+
+def connect():
+    try:
+        import duckdb
+    except ImportError as e:  # optional dependency
+        raise RuntimeError("The local transform engine requires the 'duckdb' package") from e
+    con = duckdb.connect()
+    # Timestamps without an offset are read as UTC, like Spark with a UTC session time zone (the Databricks default)
+    con.execute("SET TimeZone = 'UTC'")
+    return con
+
+
+def _q(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _lit(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def duckdb_type(spark_type) -> str:
+    """DuckDB type for a Spark data type in its JSON form."""
+    if isinstance(spark_type, str):
+        if spark_type.startswith("decimal"):
+            return spark_type.upper()
+        return _SPARK_TYPES.get(spark_type, "VARCHAR")
+    kind = spark_type["type"]
+    if kind == "struct":
+        fields = ", ".join(f"{_q(f['name'])} {duckdb_type(f['type'])}" for f in spark_type["fields"])
+        return f"STRUCT({fields})"
+    if kind == "array":
+        return f"{duckdb_type(spark_type['elementType'])}[]"
+    if kind == "map":
+        return f"MAP({duckdb_type(spark_type['keyType'])}, {duckdb_type(spark_type['valueType'])})"
+    return "VARCHAR"
+
+
+def registered_columns(registry: SchemaRegistry, source: str, endpoint: str) -> Optional[Dict[str, str]]:
+    doc = registry.get_json(source, endpoint)
+    if doc is None:
+        return None
+    return {f["name"]: duckdb_type(f["type"]) for f in doc["fields"]}
+
+
+def read_bronze(con, path: str, fmt: str, columns: Optional[Dict[str, str]] = None):
+    """
+    Bronze file as a DuckDB relation. With registered `columns` only those are read, with those
+    types (missing fields are null), like Spark's reader with a schema.
+    """
+    if fmt == "parquet":
+        rel = con.sql(f"SELECT * FROM read_parquet({_lit(path)})")
+        if columns:
+            rel = _query(rel, "SELECT " + ", ".join(f"CAST({_q(c)} AS {t}) AS {_q(c)}" for c, t in columns.items()) + " FROM {t}")
+        return rel
+    # .gz / .zst are decompressed by DuckDB based on the file extension
+    options = "format = 'newline_delimited'"
+    if columns:
+        options += ", columns = {" + ", ".join(f"{_lit(c)}: {_lit(t)}" for c, t in columns.items()) + "}"
+    return con.sql(f"SELECT * FROM read_json({_lit(path)}, {options})")
+
+
+_views = itertools.count()
+
+
+def _query(rel, sql: str):
+    """Run `sql` over `rel`, referenced as `{t}`; every step needs its own view name."""
+    name = f"_t{next(_views)}"
+    return rel.query(name, sql.format(t=name))
+
+
+def _with_columns(rel, exprs: Dict[str, str]):
+    """Spark's withColumn: existing columns are replaced in place, new ones appended."""
+    replace = [f"{e} AS {_q(c)}" for c, e in exprs.items() if c in rel.columns]
+    append = [f"{e} AS {_q(c)}" for c, e in exprs.items() if c not in rel.columns]
+    select = "*" + (f" REPLACE ({', '.join(replace)})" if replace else "")
+    return _query(rel, f"SELECT {', '.join([select] + append)} FROM {{t}}")
+
+
+def _to_timestamp(c: str) -> str:
+    # Unparseable values become null, like Spark's to_timestamp; stored as UTC wall-clock time
+    return f"timezone('UTC', TRY_CAST({_q(c)} AS TIMESTAMPTZ))"
+
+
+_LOADED_AT = "timezone('UTC', current_timestamp)"
+
+
+def _dedupe_latest(rel, key: str):
+    """
+    One row per key: the latest by the first available change-order column, or an arbitrary one
+    if the table has none.
+    """
+    order = next((c for c in CHANGE_ORDER_COLS if c in rel.columns), None)
+    if order is None:
+        return _query(rel, f"SELECT DISTINCT ON ({_q(key)}) * FROM {{t}}")
+    return _query(
+        rel, f"SELECT * FROM {{t}} QUALIFY row_number() OVER (PARTITION BY {_q(key)} ORDER BY {_q(order)} DESC NULLS LAST) = 1"
+    )
+
+
+def clean_customers(bronze):
+    rel = bronze
+    timestamps = {c: _to_timestamp(c) for c in ("created_at", "updated_at") if c in rel.columns}
+    if timestamps:
+        rel = _with_columns(rel, timestamps)
+    if CUSTOMERS_KEY in rel.columns:
+        rel = _dedupe_latest(rel, CUSTOMERS_KEY)
+    if "email" in rel.columns:
+        rel = _with_columns(rel, {"email": f"CAST({_q('email')} AS VARCHAR)"})
+    return _with_columns(rel, {"etl_loaded_at": _LOADED_AT})
+
+
+def clean_payments(bronze):
+    rel = bronze
+    exprs = {c: _to_timestamp(c) for c in ("created_at", "paid_at", "updated_at") if c in rel.columns}
+    if "amount" in rel.columns:
+        exprs = {"amount": f"TRY_CAST({_q('amount')} AS DOUBLE)", **exprs}
+    if exprs:
+        rel = _with_columns(rel, exprs)
+    if PAYMENTS_KEY in rel.columns:
+        rel = _dedupe_latest(rel, PAYMENTS_KEY)
+    return _with_columns(rel, {"etl_loaded_at": _LOADED_AT})
+
+
+def gold_facts(customers_silver, payments_silver) -> Dict[str, object]:
+    dim_customers = customers_silver
+    if "etl_loaded_at" in customers_silver.columns:
+        dim_customers = _query(customers_silver, "SELECT * EXCLUDE (etl_loaded_at) FROM {t}")
+    return {
+        "dim_customers": dim_customers,
+        "fact_payments": payments_silver,
+    }
+
+
+def _materialize(con, rel, path: str):
+    """Write `rel` to a local parquet file and continue from that file (the chain runs once)."""
+    rel.write_parquet(path)
+    return con.sql(f"SELECT * FROM read_parquet({_lit(path)})")
+
+
+def _download(adls: ADLSClient, container: str, blob: str, workdir: str) -> str:
+    # Keep the file extension: DuckDB picks the codec from it
+    path = os.path.join(workdir, blob.replace("/", "__"))
+    with open(path, "wb") as f:
+        adls.download_to_file(container, blob, f, max_concurrency=4)
+    return path
+
+
+def _replace_table(adls: ADLSClient, container: str, prefix: str, local_path: str) -> str:
+    """
+    Upload one parquet file as the whole table under `prefix` (other files there are removed,
+    like Spark's overwrite mode). Returns the blob name.
+    """
+    blob = f"{prefix}/{PART_NAME}"
+    for stale in adls.list_blobs(container, prefix + "/"):
+        if stale != blob:
+            adls.delete_blob(container, stale)
+    with open(local_path, "rb") as f, adls.open_block_writer(container, blob) as writer:
+        shutil.copyfileobj(f, writer)
+    log.info("Wrote %s", blob)
+    return blob
+
+
+def gold_manifest(con, local_path: str, blob: str, key: Optional[str]) -> dict:
+    """
+    Same document as `run_transform.write_gold_manifest` for a one-file table. The content hash
+    is a sum of DuckDB row hashes, so it is stable across local runs but not equal to Spark's.
+    """
+    columns = [r[0] for r in con.sql(f"DESCRIBE SELECT * FROM read_parquet({_lit(local_path)})").fetchall()]
+    hash_cols = [c for c in columns if c not in VOLATILE_COLS]
+    row_hash = f"CAST(hash({', '.join(_q(c) for c in hash_cols)}) AS HUGEINT)" if hash_cols else "0"
+    aggs = ["count(*)", f"sum({row_hash})"]
+    if key and key in columns:
+        aggs += [f"min({_q(key)})", f"max({_q(key)})"]
+    row = con.sql(f"SELECT {', '.join(aggs)} FROM read_parquet({_lit(local_path)})").fetchone()
+    rows, hash_sum = row[0], int(row[1] or 0)
+
+    files = []
+    if rows:
+        entry = {"path": blob, "rows": rows, "content_hash": hashlib.sha256(f"{rows}:{hash_sum}".encode()).hexdigest()}
+        if len(row) > 2:
+            entry["key_min"] = None if row[2] is None else str(row[2])
+            entry["key_max"] = None if row[3] is None else str(row[3])
+        files.append(entry)
+    return {
+        "key": key,
+        "columns": columns,
+        "rows": rows,
+        "content_hash": hashlib.sha256(f"{rows}:{hash_sum}".encode()).hexdigest(),
+        "files": files,
+    }
+
+
+def _read_columns(path: str, columns):
+    """Only the given columns of a local parquet file, as an Arrow table."""
+    import pyarrow.parquet as pq
+
+    present = set(pq.read_schema(path).names)
+    return pq.read_table(path, columns=[c for c in sorted(set(columns)) if c in present])
+
+
+def gold_qc_passed(table_name: str, gold: Dict[str, str], qc_spec: dict, run_date: str) -> bool:
+    """
+    Run the table's configured checks on its gold parquet file (`gold`: table -> local path),
+    reading only the columns the checks use, and only `ref_column` of referenced tables.
+    Returns False only when a check failed and the table is marked `blocking`.
+    """
+    table_spec = qc_spec.get("tables", {}).get(table_name)
+    if not table_spec or not table_spec.get("checks"):
+        return True
+    specs = checks_from_config(table_spec["checks"])
+    table = _read_columns(gold[table_name], [c for s in specs for c in spec_columns(s)])
+    refs = {
+        s.ref: _read_columns(gold[s.ref], [s.ref_column])
+        for s in specs if isinstance(s, ReferentialIntegrity) and s.ref in gold
+    }
+    results = run_suite(table, specs, refs=refs)
+    text = notify_qc_results(f"QC gold {table_name} run_date={run_date}", results)
+    if all(r.passed for r in results):
+        log.info("%s", text)
+        return True
+    log.warning("%s", text)
+    return not table_spec.get("blocking", False)
+
+
+def bronze_blob(spec: dict, run_manifest: Optional[dict], source: str, endpoint: str, run_date: str) -> Tuple[str, bool]:
+    """
+    Blob holding the run's bronze for an endpoint, and whether it is unchanged (an earlier run's
+    identical blob, per the run manifest).
+    """
+    key = extract_entry_key(source, endpoint)
+    if is_unchanged(run_manifest, key):
+        return run_manifest[key]["blob"], True
+    return bronze_blob_path(source, endpoint, run_date, bronze_format(spec, source, endpoint)), False
+
+
+def bronze_bytes(
+    adls: ADLSClient, container: str, spec: dict, run_date: str, run_manifest: Optional[dict] = None
+) -> Optional[int]:
+    """
+    Estimated uncompressed size of all bronze inputs of the gold tables (what `pick_engine`
+    compares): stored size times `BRONZE_EXPANSION` for the blob's format. None when an input
+    blob is missing.
+    """
+    total = 0
+    for source, endpoint in sorted({i for inputs in GOLD_INPUTS.values() for i in inputs}):
+        blob, _ = bronze_blob(spec, run_manifest, source, endpoint, run_date)
+        try:
+            size = adls.blob_size(container, blob)
+        except ResourceNotFoundError:
+            log.warning("Bronze input %s/%s not found at %s", source, endpoint, blob)
+            return None
+        fmt = next((f for f in BRONZE_EXPANSION if blob.endswith(f".{f}")), "jsonl")
+        total += size * BRONZE_EXPANSION[fmt]
+    return total
+
+
+def run_local_transform(
+    adls: ADLSClient,
+    container: str,
+    run_date: str,
+    spec: dict,
+    registry: SchemaRegistry,
+    qc_spec: dict,
+    run_manifest: Optional[dict] = None,
+    output_root: str = "",
+    skip_unchanged: bool = True,
+) -> Tuple[Dict[str, dict], List[str]]:
+    """
+    Bronze -> silver -> gold for `run_date`, written under `{output_root}silver/...` and
+    `{output_root}gold/...`. Returns (gold entries for the run manifest, tables blocked by QC).
+
+    With `skip_unchanged=False` every table is rebuilt; unchanged endpoints are still read from
+    the blob the run manifest points at.
+    """
+    # Gold table -> earlier run_date whose gold it equals (all inputs unchanged since then), else None
+    unchanged = {
+        table: unchanged_since(run_manifest, [extract_entry_key(*i) for i in inputs]) if skip_unchanged else None
+        for table, inputs in GOLD_INPUTS.items()
+    }
+    if all(unchanged.values()):
+        log.info("All bronze inputs unchanged for run_date=%s; nothing to transform", run_date)
+        return {gold_entry_key(table): {"status": UNCHANGED, "same_as": d} for table, d in unchanged.items()}, []
+
+    con = connect()
+    entries: Dict[str, dict] = {}
+    blocked: List[str] = []
+    with tempfile.TemporaryDirectory(prefix="transform-") as workdir:
+        silver = {}
+        for endpoint, domain, clean in (
+            ("customers", "core", clean_customers),
+            ("payments", "finance", clean_payments),
+        ):
+            blob, same = bronze_blob(spec, run_manifest, "superoperator", endpoint, run_date)
+            fmt = bronze_format(spec, "superoperator", endpoint)
+            with log_stage(log, f"silver:{endpoint}") as st:
+                bronze = read_bronze(
+                    con, _download(adls, container, blob, workdir), fmt,
+                    registered_columns(registry, "superoperator", endpoint),
+                )
+                local = os.path.join(workdir, f"silver-{endpoint}.parquet")
+                silver[endpoint] = _materialize(con, clean(bronze), local)
+                st["rows"] = _count(con, f"read_parquet({_lit(local)})")
+                # An unchanged endpoint's silver for this run_date would equal the earlier run's
+                if not (same and skip_unchanged):
+                    _replace_table(adls, container, f"{output_root}silver/{domain}/{endpoint}/run_date={run_date}", local)
+
+        # Silver -> Gold (curated); all tables are materialized since QC may reference any of them
+        gold = {}
+        for table_name, rel in gold_facts(silver["customers"], silver["payments"]).items():
+            local = os.path.join(workdir, f"gold-{table_name}.parquet")
+            _materialize(con, rel, local)
+            gold[table_name] = local
+
+        for table_name, local in gold.items():
+            if unchanged.get(table_name):
+                log.info("Gold %s skipped: same as run_date=%s", table_name, unchanged[table_name])
+                entries[gold_entry_key(table_name)] = {"status": UNCHANGED, "same_as": unchanged[table_name]}
+                continue
+            domain = "core" if table_name.startswith("dim_") else "finance"
+            with log_stage(log, f"qc:{table_name}"):
+                if not gold_qc_passed(table_name, gold, qc_spec, run_date):
+                    log.error("QC failed for %s; gold write skipped", table_name)
+                    blocked.append(table_name)
+                    continue
+            with log_stage(log, f"gold:{table_name}") as st:
+                prefix = f"{output_root}gold/{domain}/{table_name}/run_date={run_date}"
+                blob = _replace_table(adls, container, prefix, local)
+                manifest = gold_manifest(con, local, blob, GOLD_KEYS.get(table_name))
+                adls.upload_text(container, f"{prefix}/{MANIFEST_NAME}", json.dumps(manifest, indent=2, default=str))
+                st["rows"] = manifest["rows"]
+                st["files"] = len(manifest["files"])
+            entries[gold_entry_key(table_name)] = {"status": CHANGED, "hash": manifest["content_hash"]}
+
+    return entries, blocked
+
+
+def _count(con, source: str) -> int:
+    return con.sql(f"SELECT count(*) FROM {source}").fetchone()[0]
+
+
+def _normalized_select(con, files: List[str]) -> Tuple[Dict[str, str], str]:
+    source = f"read_parquet([{', '.join(_lit(f) for f in files)}], union_by_name = true)"
+    described = con.sql(f"DESCRIBE SELECT * FROM {source}").fetchall()
+    # Spark may write INT96 or UTC-adjusted timestamps; compare everything as UTC wall-clock time
+    exprs = {
+        name: f"CAST({_q(name)} AS TIMESTAMP)" if str(kind).upper().startswith("TIMESTAMP") else _q(name)
+        for name, kind, *_ in described
+        if name not in VOLATILE_COLS
+    }
+    return exprs, source
+
+
+def gold_parity(adls: ADLSClient, container: str, run_date: str, left_root: str, right_root: str) -> Dict[str, dict]:
+    """
+    Compare the gold tables of `run_date` under two roots (e.g. Spark's output at "" and the local
+    engine's at "_parity/local/") as multisets of rows, ignoring volatile columns. Per table:
+    row counts, rows only on each side and column differences; `equal` is True when identical.
+
+    Records that tie on every change-order column are deduplicated arbitrarily by both engines
+    and can show up as differences.
+    """
+    con = connect()
+    report: Dict[str, dict] = {}
+    with tempfile.TemporaryDirectory(prefix="parity-") as workdir:
+        for table_name in GOLD_INPUTS:
+            domain = "core" if table_name.startswith("dim_") else "finance"
+            sides = []
+            for root in (left_root, right_root):
+                prefix = f"{root}gold/{domain}/{table_name}/run_date={run_date}/"
+                blobs = [b for b in adls.list_blobs(container, prefix) if b.endswith(".parquet")]
+                sides.append([_download(adls, container, b, workdir) for b in blobs])
+            if not all(sides):
+                report[table_name] = {"equal": False, "detail": "missing on one side", "files": [len(s) for s in sides]}
+                continue
+
+            (left, left_src), (right, right_src) = (_normalized_select(con, files) for files in sides)
+            shared = sorted(left.keys() & right.keys())
+            lsel = ", ".join(left[c] for c in shared)
+            rsel = ", ".join(right[c] for c in shared)
+            entry = {
+                "rows_left": _count(con, left_src),
+                "rows_right": _count(con, right_src),
+                "only_left": _count(con, f"(SELECT {lsel} FROM {left_src} EXCEPT ALL SELECT {rsel} FROM {right_src})"),
+                "only_right": _count(con, f"(SELECT {rsel} FROM {right_src} EXCEPT ALL SELECT {lsel} FROM {left_src})"),
+                "columns_only_left": sorted(left.keys() - right.keys()),
+                "columns_only_right": sorted(right.keys() - left.keys()),
+            }
+            entry["equal"] = not (
+                entry["only_left"] or entry["only_right"] or entry["columns_only_left"] or entry["columns_only_right"]
+            )
+            report[table_name] = entry
+    return report
@@ -0,0 +1,18 @@
+"""
+Table keys and gold table definitions shared by the Spark (`run_transform.py`) and in-process
+(`src/transform_local.py`) transform engines. Kept free of pyspark/duckdb imports.
+"""
+from __future__ import annotations
+
+CUSTOMERS_KEY = "id"
+PAYMENTS_KEY = "payment_id"
+# First column present is used to pick the latest version of a record
+CHANGE_ORDER_COLS = ("updated_at", "paid_at", "created_at")
+
+# Gold table -> key column recorded in its manifest
+GOLD_KEYS = {"dim_customers": CUSTOMERS_KEY, "fact_payments": PAYMENTS_KEY}
+# Gold table -> bronze endpoints it is built from; unchanged inputs mean an unchanged table
+GOLD_INPUTS = {"dim_customers": [("superoperator", "customers")], "fact_payments": [("superoperator", "payments")]}
+# Columns that change on every run without the data changing; left out of content hashes and parity
+VOLATILE_COLS = ("etl_loaded_at",)
+MANIFEST_NAME = "_manifest.json"
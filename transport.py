@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import email.utils
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+@dataclass
+class RateLimit:
+    requests_per_second: float = 5.0
+    burst: int = 10
+
+
+@dataclass
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter.
+
+    Retries 429s, 5xx responses, timeouts and connection errors. Non-idempotent requests
+    (POST) are only retried on 429 and connect timeouts, where the server did not act on them.
+    """
+    max_retries: int = 5
+    backoff_base: float = 0.5
+    backoff_max: float = 30.0
+    retry_statuses: tuple = (429, 500, 502, 503, 504)
+
+    def delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket shared by every caller that talks to one host.
+
+    The refill rate adapts to throttling: a 429 halves the rate and blocks all callers until
+    the server's Retry-After has passed; each successful response recovers 10% of the
+    configured rate.
+    """
+
+    def __init__(self, limit: RateLimit, min_rate: float = 0.2):
+        self.max_rate = float(limit.requests_per_second)
+        self.min_rate = min(min_rate, self.max_rate)
+        self.rate = self.max_rate
+        self.capacity = max(1, int(limit.burst))
+        self._tokens = float(self.capacity)
+        self._last = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self._blocked_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = max(self._blocked_until - now, (1 - self._tokens) / self.rate)
+            time.sleep(wait)
+
+    def throttle(self, retry_after: float) -> None:
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = 0.0
+            self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+
+    def on_success(self) -> None:
+        with self._lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * 0.1)
+
+
+def _retry_after_seconds(resp: requests.Response) -> Optional[float]:
+    value = resp.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+        return max(0.0, when.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class HttpTransport:
+    """
+    Connection-pooled HTTP layer shared by the REST and QuickBooks connectors.
+
+    - One `requests.Session` with a sized connection pool, so TCP/TLS connections are kept alive
+      and reused across pages, endpoints and threads.
+    - One token bucket per host (see `set_rate_limit`).
+    - Retries with backoff per `RetryPolicy`.
+
+    Returns the final response; callers decide whether to `raise_for_status()`.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = 32,
+        retry: Optional[RetryPolicy] = None,
+        default_rate_limit: Optional[RateLimit] = None,
+    ):
+        self.retry = retry or RetryPolicy()
+        self.default_rate_limit = default_rate_limit or RateLimit()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _host(url: str) -> str:
+        return urlsplit(url).netloc.lower()
+
+    def set_rate_limit(self, url: str, limit: RateLimit) -> None:
+        with self._lock:
+            self._buckets[self._host(url)] = TokenBucket(limit)
+
+    def _bucket(self, url: str) -> TokenBucket:
+        host = self._host(url)
+        with self._lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(self.default_rate_limit)
+            return self._buckets[host]
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        bucket = self._bucket(url)
+        idempotent = method.upper() in ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+        attempt = 0
+        while True:
+            bucket.acquire()
+            try:
+                resp = self.session.request(method, url, **kwargs)
+            except (requests.Timeout, requests.ConnectionError) as e:
+                retriable = idempotent or isinstance(e, requests.exceptions.ConnectTimeout)
+                if not retriable or attempt >= self.retry.max_retries:
+                    raise
+                time.sleep(self.retry.delay(attempt))
+                attempt += 1
+                continue
+
+            if resp.status_code == 429:
+                if attempt >= self.retry.max_retries:
+                    return resp
+                bucket.throttle(_retry_after_seconds(resp) or self.retry.delay(attempt))
+                attempt += 1
+                continue
+
+            if resp.status_code in self.retry.retry_statuses and idempotent and attempt < self.retry.max_retries:
+                time.sleep(_retry_after_seconds(resp) or self.retry.delay(attempt))
+                attempt += 1
+                continue
+
+            bucket.on_success()
+            return resp
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+
+_shared: Optional[HttpTransport] = None
+_shared_lock = threading.Lock()
+
+
+def get_transport() -> HttpTransport:
+    """
+    Process-wide transport, so every connector shares one connection pool and one set of
+    per-host rate limiters.
+    """
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = HttpTransport(pool_size=int(os.getenv("HTTP_POOL_SIZE", "32")))
+        return _shared